@@ -0,0 +1,203 @@
+__author__ = 'fabian'
+
+import numpy as np
+import os
+import tempfile
+
+# number of array elements that are converted to float64 at once while discretizing
+CHUNK_BUDGET = 2 ** 22
+
+
+def column_statistics(X, chunk_size):
+    """
+    Computes standard deviation, minimum and maximum of every column of X in a single pass over chunks of rows
+    (merging the per-chunk moments as in Chan et al.)
+
+    :param X: (n_samples, n_features) array-like that supports slicing of rows
+    :param chunk_size: number of rows to read at once
+    :return: tuple of (n_features) arrays: standard deviation, minimum, maximum
+    """
+    n_features = X.shape[1]
+    n = 0
+    mean = np.zeros(n_features)
+    m2 = np.zeros(n_features)
+    minimum = np.zeros(n_features) + np.inf
+    maximum = np.zeros(n_features) - np.inf
+    for start in range(0, X.shape[0], chunk_size):
+        chunk = np.asarray(X[start:start + chunk_size], dtype="float64")
+        n_chunk = chunk.shape[0]
+        chunk_mean = chunk.mean(axis=0)
+        delta = chunk_mean - mean
+        m2 += ((chunk - chunk_mean) ** 2).sum(axis=0) + delta ** 2 * n * n_chunk / float(n + n_chunk)
+        mean += delta * n_chunk / float(n + n_chunk)
+        n += n_chunk
+        minimum = np.minimum(minimum, chunk.min(axis=0))
+        maximum = np.maximum(maximum, chunk.max(axis=0))
+    return np.sqrt(m2 / n), minimum, maximum
+
+
+def read_rows(X, rows, chunk_size=None):
+    """
+    Reads the given rows of X chunk by chunk, so that X only needs to support slicing of rows
+
+    :param X: (n_samples, n_features) array-like that supports X.shape and slicing of rows
+    :param rows: sorted row ids
+    :param chunk_size: number of rows to read at once. Default (None) derives it from CHUNK_BUDGET
+    :return: (len(rows), n_features) numpy array
+    """
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_BUDGET // max(X.shape[1], 1))
+    rows = np.asarray(rows, dtype=np.intp)
+    parts = []
+    for start in range(0, X.shape[0], chunk_size):
+        first, last = np.searchsorted(rows, [start, start + chunk_size])
+        if last > first:
+            parts += [np.asarray(X[start:start + chunk_size])[rows[first:last] - start]]
+    if len(parts) == 0:
+        return np.asarray(X[0:0])
+    return np.concatenate(parts)
+
+
+def smallest_unsigned_dtype(max_value):
+    """
+    :return: the narrowest unsigned integer dtype that can hold max_value
+    """
+    for dtype in ["uint8", "uint16", "uint32"]:
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype("uint64")
+
+
+class Discretizer(object):
+    def __init__(self, strategy="std", n_bins=10, max_bins=None, chunk_size=None):
+        """
+        Maps every feature to consecutive integer states (histogram bins) starting at 0. The input is never modified,
+        the states are stored column by column (Fortran order) in the narrowest unsigned integer type that holds them.
+
+        :param strategy: binning strategy (as string):
+                         - "std": bins of the width of one standard deviation of the feature, starting at its minimum
+                                  (the number of bins depends on the data)
+                         - "uniform": n_bins bins of equal width between minimum and maximum of the feature
+                         - "quantile": n_bins bins that contain (roughly) the same number of samples
+        :param n_bins: number of bins of the "uniform" and "quantile" strategies
+        :param max_bins: upper bound of the number of bins of every feature. For the "std" strategy the bins of
+                         features that would need more bins are widened accordingly. Default (None): no bound
+        :param chunk_size: number of samples that are read from X at once. Default (None) derives it from
+                           CHUNK_BUDGET. The statistics of the "std" strategy are computed over whole columns unless
+                           chunk_size is given
+        """
+        if strategy not in ["std", "uniform", "quantile"]:
+            raise ValueError("strategy must be one of the following: ['std', 'uniform', 'quantile']")
+        if max_bins is not None and max_bins < 1:
+            raise ValueError("max_bins must be at least 1")
+        self._strategy = strategy
+        self._n_bins = n_bins if max_bins is None else min(n_bins, max_bins)
+        self._max_bins = max_bins
+        self._chunk_size = chunk_size
+        self._width = None
+        self._lowest = None
+        self._edges = None
+        self._alphabet_sizes = None
+
+    def _get_chunk_size(self, X):
+        if self._chunk_size is not None:
+            return self._chunk_size
+        return max(1, CHUNK_BUDGET // max(X.shape[1], 1))
+
+    def fit(self, X):
+        """
+        Determines the bins of every feature
+
+        :param X: (n_samples, n_features) array-like that supports X.shape and slicing of rows
+        :return: self
+        """
+        chunk_size = self._get_chunk_size(X)
+        if self._strategy == "quantile":
+            self._edges = self._quantile_edges(X, chunk_size)
+            self._alphabet_sizes = np.array([len(edges) + 1 for edges in self._edges])
+            return self
+
+        if self._chunk_size is None and isinstance(X, np.ndarray) and not isinstance(X, np.memmap):
+            std = np.array([np.asarray(X[:, i], dtype="float64").std() for i in range(X.shape[1])])
+            minimum = np.asarray(X.min(axis=0), dtype="float64")
+            maximum = np.asarray(X.max(axis=0), dtype="float64")
+        else:
+            std, minimum, maximum = column_statistics(X, chunk_size)
+
+        if self._strategy == "std":
+            width = std
+            if self._max_bins is not None:
+                width = np.maximum(width, (maximum - minimum) / self._max_bins)
+        else:
+            width = (maximum - minimum) / self._n_bins
+        width[width == 0.] = 1.
+        self._width = width
+        self._lowest = minimum / width
+        self._alphabet_sizes = np.floor(maximum / width - self._lowest).astype("int64") + 1
+        if self._strategy == "uniform" or self._max_bins is not None:
+            n_bins = self._n_bins if self._strategy == "uniform" else self._max_bins
+            self._alphabet_sizes = np.minimum(self._alphabet_sizes, n_bins)
+        return self
+
+    def _quantile_edges(self, X, chunk_size):
+        # quantiles are estimated from (at most) a strided subset of CHUNK_BUDGET values per feature
+        step = max(1, X.shape[0] * X.shape[1] // CHUNK_BUDGET)
+        sample = np.vstack([np.asarray(X[start:start + chunk_size], dtype="float64")[(-start) % step::step]
+                            for start in range(0, X.shape[0], chunk_size)])
+        quantiles = np.linspace(0., 1., self._n_bins + 1)[1:-1]
+        edges = [np.unique(np.quantile(sample[:, i], quantiles)) for i in range(X.shape[1])]
+        # an edge at the minimum would leave the first bin empty
+        return [column_edges[column_edges > sample[:, i].min()] for i, column_edges in enumerate(edges)]
+
+    def get_alphabet_sizes(self):
+        """
+        :return: (n_features) array containing the number of states of each feature
+        """
+        return self._alphabet_sizes
+
+    def get_dtype(self):
+        """
+        :return: the dtype of the states
+        """
+        return smallest_unsigned_dtype(int(self._alphabet_sizes.max()) - 1)
+
+    def transform(self, X, out=None):
+        """
+        Maps X to the states determined by fit()
+
+        :param X: (n_samples, n_features) array-like that supports X.shape and slicing of rows
+        :param out: (n_samples, n_features) array the states are written to. Default (None) allocates a new array
+        :return: (n_samples, n_features) array of states in [0, alphabet_sizes[i])
+        """
+        if out is None:
+            out = np.empty(X.shape, dtype=self.get_dtype(), order="F")
+        chunk_size = self._get_chunk_size(X)
+        upper = self._alphabet_sizes - 1
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = np.asarray(X[start:start + chunk_size], dtype="float64")
+            if self._strategy == "quantile":
+                states = np.column_stack([np.searchsorted(edges, chunk[:, i], side="right")
+                                          for i, edges in enumerate(self._edges)])
+            else:
+                states = np.floor(chunk / self._width - self._lowest)
+            out[start:start + chunk_size] = np.clip(states, 0, upper)
+        return out
+
+    def fit_transform(self, X, out_of_core=False, directory=None):
+        """
+        Determines the bins and maps X to its states
+
+        :param X: (n_samples, n_features) array-like that supports X.shape and slicing of rows
+        :param out_of_core: write the states to a memory-mapped temporary file instead of keeping them in memory
+        :param directory: directory of the temporary file. Default (None) uses the system default
+        :return: (n_samples, n_features) array of states in [0, alphabet_sizes[i])
+        """
+        self.fit(X)
+        out = None
+        if out_of_core:
+            if directory is not None and not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+            # the temporary file is deleted as soon as the memory map is closed
+            out = np.memmap(tempfile.TemporaryFile(dir=directory), dtype=self.get_dtype(), mode="w+",
+                            shape=X.shape, order="F")
+        return self.transform(X, out)
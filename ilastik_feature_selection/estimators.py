@@ -0,0 +1,209 @@
+__author__ = 'fabian'
+
+import numpy as np
+from scipy.special import digamma
+from sklearn.neighbors import KDTree, NearestNeighbors
+from . import mutual_information
+from .discretization import Discretizer
+
+
+class MutualInformationEstimator(object):
+    """
+    Interface of the mutual information estimators used by FilterFeatureSelection. An estimator is fitted to the data
+    once and then queried for many features (or pairs of features) per call, so that it can share work between them.
+    All values are in bits.
+    """
+    def fit(self, X, Y):
+        """
+        :param X: (n_samples, n_features) numpy array containing the (raw) training data
+        :param Y: (n_samples) numpy array containing target labels
+        :return: self
+        """
+        raise NotImplementedError
+
+    def relevancy(self, features):
+        """
+        :param features: array of feature ids
+        :return: array containing I(X_i;Y) for each i in features
+        """
+        raise NotImplementedError
+
+    def redundancy(self, i, j):
+        """
+        :param i: array of feature ids
+        :param j: array of feature ids, broadcast against i
+        :return: array containing I(X_i;X_j) for each pair
+        """
+        raise NotImplementedError
+
+    def conditional_redundancy(self, i, j):
+        """
+        :param i: array of feature ids
+        :param j: array of feature ids, broadcast against i
+        :return: array containing the class conditional mutual information I(X_i;X_j|Y) for each pair
+        """
+        raise NotImplementedError
+
+
+def _pairs(i, j):
+    return np.broadcast_arrays(np.asarray(i, dtype=np.intp), np.asarray(j, dtype=np.intp))
+
+
+class HistogramEstimator(MutualInformationEstimator):
+    def __init__(self, discretizer=None):
+        """
+        Estimates the mutual information from (joint) histograms of the discretized features. All pairs that share
+        their first feature are counted in one batch.
+
+        :param discretizer: Discretizer that maps the features to histogram bins. Default (None) uses Discretizer()
+        """
+        if discretizer is None:
+            discretizer = Discretizer()
+        self._discretizer = discretizer
+        self._X = None
+        self._alphabet_sizes = None
+        self._y = None
+        self._n_classes = None
+
+    def fit(self, X, Y):
+        X = self._discretizer.fit_transform(X)
+        y, n_classes = mutual_information.encode_labels(Y)
+        return self.fit_discretized(X, self._discretizer.get_alphabet_sizes(), y, n_classes)
+
+    def fit_discretized(self, X, alphabet_sizes, y, n_classes):
+        """
+        Uses data that has already been discretized
+
+        :param X: (n_samples, n_features) integer array of discretized data with values in [0, alphabet_sizes[i])
+        :param alphabet_sizes: (n_features) array containing the number of states of each feature
+        :param y: (n_samples) integer array of label codes with values in [0, n_classes)
+        :param n_classes: number of distinct labels
+        :return: self
+        """
+        self._X = X
+        self._alphabet_sizes = alphabet_sizes
+        self._y = y
+        self._n_classes = n_classes
+        return self
+
+    def relevancy(self, features):
+        return mutual_information.relevancy(self._X, self._alphabet_sizes, self._y, self._n_classes, features)
+
+    def _grouped_pairs(self, i, j, conditional):
+        i, j = _pairs(i, j)
+        result = np.zeros(i.shape)
+        for feature in np.unique(i):
+            mask = i == feature
+            if conditional:
+                result[mask] = mutual_information.pairwise_conditional_mutual_information(
+                    self._X, self._alphabet_sizes, self._y, self._n_classes, [feature], j[mask])[0]
+            else:
+                result[mask] = mutual_information.pairwise_mutual_information(
+                    self._X, self._alphabet_sizes, [feature], j[mask])[0]
+        return result
+
+    def redundancy(self, i, j):
+        return self._grouped_pairs(i, j, False)
+
+    def conditional_redundancy(self, i, j):
+        return self._grouped_pairs(i, j, True)
+
+
+class KSGEstimator(MutualInformationEstimator):
+    def __init__(self, n_neighbors=3, random_state=0):
+        """
+        k-nearest-neighbour estimator for continuous features [Kraskov2004]. The relevancy uses the variant for a
+        discrete target [Ross2014], the class conditional redundancy averages the estimates within each class. The
+        KD-trees of the single features (per class) that are needed for the neighbour counts are built once and reused
+        for all pairs the feature takes part in.
+
+        :param n_neighbors: number of neighbours k. Larger values reduce the variance and increase the bias
+        :param random_state: seed of the small noise that is added to break ties between samples
+        """
+        self._n_neighbors = n_neighbors
+        self._random_state = random_state
+        self._X = None
+        self._y = None
+        self._n_classes = None
+        self._trees = {}
+
+    def fit(self, X, Y):
+        X = np.array(X, dtype="float64")
+        std = X.std(axis=0)
+        std[std == 0.] = 1.
+        X = (X - X.mean(axis=0)) / std
+        rng = np.random.RandomState(self._random_state)
+        X += 1e-10 * np.maximum(1., np.mean(np.abs(X), axis=0)) * rng.randn(*X.shape)
+        self._X = X
+        self._y, self._n_classes = mutual_information.encode_labels(Y)
+        self._trees = {}
+        return self
+
+    def _samples(self, label):
+        if label is None:
+            return np.arange(self._X.shape[0])
+        return np.flatnonzero(self._y == label)
+
+    def _tree(self, feature, label):
+        """
+        :return: KD-tree over the values of one feature (within one class, unless label is None)
+        """
+        key = (feature, label)
+        if key not in self._trees:
+            self._trees[key] = KDTree(self._X[self._samples(label), feature][:, None], metric="chebyshev")
+        return self._trees[key]
+
+    def relevancy(self, features):
+        label_counts = np.bincount(self._y, minlength=self._n_classes)
+        counts = label_counts[self._y]
+        # samples of classes with a single sample have no neighbours and are left out
+        usable = counts > 1
+        result = np.zeros(len(features))
+        for index, feature in enumerate(features):
+            x = self._X[:, feature]
+            radius = np.zeros(len(x))
+            k_all = np.zeros(len(x))
+            for label in np.flatnonzero(label_counts > 1):
+                mask = self._y == label
+                k = min(self._n_neighbors, label_counts[label] - 1)
+                distances = NearestNeighbors(n_neighbors=k).fit(x[mask, None]).kneighbors()[0]
+                radius[mask] = np.nextafter(distances[:, -1], 0)
+                k_all[mask] = k
+            if np.all(usable):
+                tree = self._tree(feature, None)
+            else:
+                tree = KDTree(x[usable, None], metric="chebyshev")
+            m_all = tree.query_radius(x[usable, None], radius[usable], count_only=True)
+            mi = (digamma(np.sum(usable)) + np.mean(digamma(k_all[usable])) - np.mean(digamma(counts[usable])) -
+                  np.mean(digamma(m_all)))
+            result[index] = max(0., mi) / mutual_information.LOG2
+        return result
+
+    def _ksg(self, feat1, feat2, label):
+        """
+        :return: I(X_feat1;X_feat2) in nats, estimated within one class (or from all samples if label is None)
+        """
+        samples = self._samples(label)
+        k = min(self._n_neighbors, len(samples) - 1)
+        x1 = self._X[samples, feat1][:, None]
+        x2 = self._X[samples, feat2][:, None]
+        distances = NearestNeighbors(n_neighbors=k, metric="chebyshev").fit(np.hstack([x1, x2])).kneighbors()[0]
+        radius = np.nextafter(distances[:, -1], 0)
+        n1 = self._tree(feat1, label).query_radius(x1, radius, count_only=True)
+        n2 = self._tree(feat2, label).query_radius(x2, radius, count_only=True)
+        mi = digamma(len(samples)) + digamma(k) - np.mean(digamma(n1)) - np.mean(digamma(n2))
+        return max(0., mi)
+
+    def redundancy(self, i, j):
+        i, j = _pairs(i, j)
+        result = [self._ksg(feat1, feat2, None) for feat1, feat2 in zip(i.ravel(), j.ravel())]
+        return np.array(result).reshape(i.shape) / mutual_information.LOG2
+
+    def conditional_redundancy(self, i, j):
+        i, j = _pairs(i, j)
+        label_counts = np.bincount(self._y, minlength=self._n_classes)
+        labels = np.flatnonzero(label_counts > 1)
+        weights = label_counts[labels] / float(len(self._y))
+        result = [np.sum([weight * self._ksg(feat1, feat2, label) for label, weight in zip(labels, weights)])
+                  for feat1, feat2 in zip(i.ravel(), j.ravel())]
+        return np.array(result).reshape(i.shape) / mutual_information.LOG2
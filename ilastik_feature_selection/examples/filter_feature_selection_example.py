@@ -17,7 +17,7 @@ def select_features_digits():
 
 
     # create feature selector instance. Default criterion is "ICAP"
-    feat_selector = feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
+    feat_selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
 
     # run feature selection. Desired number of features needs to be specified
     selected_features_ICAP = feat_selector.run(10)
@@ -34,14 +34,13 @@ def select_features_digits():
     available_methods = feat_selector.get_available_methods()
     print("available methods: ", str(available_methods))
 
-    # notice how the feature selection becomes faster the more methods have already been run
-    # this is because mutual information values will be re-used once they are calculated
-    feat_selector_new = feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
-    available_methods_new = feat_selector_new.get_available_methods()
-    print("\nmutual information values are retained once they are calculated. Speedup for consecutive runs with different methods")
+    # several criteria can be run together. Their greedy searches advance step by step and share the mutual
+    # information values, which are calculated in one batch per step
+    feat_selector_new = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
+    print("\nall criteria at once (mutual information values are shared between the criteria)")
+    selected_features = feat_selector_new.run_many(available_methods, 25)
     for method in available_methods:
-        feat_selector_new.change_method(method)
-        print(method, ": ", feat_selector_new.run(25))
+        print(method, ": ", selected_features[method])
 
 
 
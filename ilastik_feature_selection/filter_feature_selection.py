@@ -1,9 +1,13 @@
 __author__ = 'fabian'
 
-from sklearn.metrics import mutual_info_score
-
 import numpy as np
+import copy
+import heapq
 import logging
+from . import mutual_information
+from . import mi_cache
+from .discretization import Discretizer, read_rows
+from .estimators import HistogramEstimator
 # import IPython
 
 
@@ -18,36 +22,144 @@ logger = logging.getLogger(__name__)
 # fhandler.setFormatter(formatter)
 #
 # logger.addHandler(fhandler)
+def _stratified_order(y, n_classes, random_state=0):
+    """
+    Random order of the samples in which every prefix is a stratified sample, i.e. contains the classes in (roughly)
+    the same proportions as the whole data
+
+    :param y: (n_samples) integer array of label codes with values in [0, n_classes)
+    :param n_classes: number of distinct labels
+    :param random_state: seed of the random order
+    :return: (n_samples) array of sample ids
+    """
+    rng = np.random.RandomState(random_state)
+    keys = np.zeros(len(y))
+    for label in range(n_classes):
+        members = rng.permutation(np.flatnonzero(y == label))
+        # spread the members of each class evenly over [0, 1)
+        keys[members] = (np.arange(len(members)) + rng.rand()) / float(len(members))
+    return np.argsort(keys, kind="stable")
+
+
+_bootstrap_data = {}
+
+
+def _init_bootstrap_worker(selector, X_descriptor, y_descriptor):
+    memory_X, selector._X = mutual_information.attach_shared_array(X_descriptor)
+    memory_y, selector._Y_codes = mutual_information.attach_shared_array(y_descriptor)
+    _bootstrap_data["memory"] = [memory_X, memory_y]
+    _bootstrap_data["selector"] = selector
+
+
+def _bootstrap_task(n_features_to_select, lazy, n_draws, seed):
+    return _bootstrap_selection(_bootstrap_data["selector"], n_features_to_select, lazy, n_draws, seed)
+
+
+def _bootstrap_selection(selector, n_features_to_select, lazy, n_draws, seed):
+    """
+    Runs the selection of a selector created by FilterFeatureSelection._bootstrap_selector() on one bootstrap
+    resample. The resample is represented by the multiplicity of each sample, which all histograms are weighted with
+
+    :return: list of selected feature ids
+    """
+    n_samples = selector._X.shape[0]
+    draws = np.random.RandomState(seed).randint(0, n_samples, n_draws)
+    selector._weights = np.bincount(draws, minlength=n_samples)
+    selector._create_caches()
+    return selector._select(n_features_to_select, selector._compute_relevancies(), [], lazy)
+
 
 class FilterFeatureSelection(object):
-    def __init__(self, X, Y, method="ICAP"):
+    def __init__(self, X, Y, method="ICAP", n_jobs=1, cache_dir=None, cache_backend="dense", chunk_size=None,
+                 discretizer=None, estimator=None, keep_counts=False):
         """
         This class provides easy access to mutual information based filter feature selection.
         The default mutual information estimation algorithm used is the histogram binning method. If a more
-        sophisticated approach is required, use the change_MI_estimator function to apply your own method.
+        sophisticated approach is required, pass another estimator (see estimators.KSGEstimator) or use the
+        change_MI_estimator function to apply your own method.
 
         :param X: (n_samples, n_features) numpy array containing the training data
         :param Y: (n_samples) numpy array containing target labels
         :param method: filter criterion that will be applied to select the features. Available criteria are: (as string)
                        "CIFE" [Lin1996], "ICAP" [Jakulin2005], "CMIM" [Fleuret2004], "JMI"[Yang1999]
+        :param n_jobs: number of worker processes used to estimate the mutual information of the candidates during
+                       run() and precompute_redundancy(). -1 uses all cpus. The selected features do not depend on
+                       this value. The workers share the discretized data (and the in-memory "dense" caches, which
+                       they fill directly) with this process instead of receiving copies
+        :param cache_dir: directory for persistent mutual information caches. Default (None) keeps the caches in
+                          memory only. Otherwise all computed values are stored in memory-mapped .npy files, keyed by
+                          a fingerprint of the discretized data and the labels, and are reused by every selector
+                          (in this or any other process) that is created for the same data
+        :param cache_backend: storage of the pairwise mutual information caches:
+                              - "dense": two float64 (n_features, n_features) matrices (default, fastest)
+                              - "packed": upper triangles in single precision plus a validity bitmap, a quarter of
+                                          the memory of "dense"
+                              - "sparse": hash map of the computed pairs only, for very wide data. Cannot be combined
+                                          with cache_dir
+        :param chunk_size: number of samples that are read from X at once. If given, or if X is a numpy.memmap or
+                           any other array-like (supporting X.shape and slicing of rows) that is not a numpy array,
+                           X is never loaded completely: it is discretized chunk by chunk into a memory-mapped
+                           temporary file (in cache_dir, if given) and all histograms are accumulated over chunks of
+                           samples as well
+        :param discretizer: Discretizer that maps the features to histogram bins. Default (None) uses bins of the width
+                            of one standard deviation of each feature (see Discretizer for other binning strategies
+                            and for bounding the number of bins)
+        :param estimator: MutualInformationEstimator that replaces the default histogram estimator (see
+                          change_MI_estimator)
+        :param keep_counts: keep the joint histograms that the mutual information values are computed from, so that
+                            add_samples() and remove_samples() only need to count the added or removed samples. Needs
+                            n_states_i * n_states_j * n_classes counts per computed pair of features. Worker processes
+                            are not used in this mode
         """
         if X.shape[0] != len(Y):
             raise ValueError("X must have as many samples as there are labels in Y")
 
         self._n_features = X.shape[1]
 
-        def normalize_data_for_MI(X):
-            for i in range(X.shape[1]):
-                std = X[:, i].std()
-                if std != 0.:
-                    X[:, i] /= std
-                    X[:, i] -= X[:, i].min()
-            return np.floor(X).astype("int")
-        
-        self._X = normalize_data_for_MI(np.asarray(X))
+        if chunk_size is None and (isinstance(X, np.memmap) or not isinstance(X, np.ndarray)):
+            chunk_size = max(1, mutual_information.BLOCK_BUDGET // self._n_features)
+        if discretizer is None:
+            discretizer = Discretizer(chunk_size=chunk_size)
+        self._discretizer = discretizer
+        # X itself is never modified. The states start at 0 in every feature so that they can directly be used as
+        # histogram bins
+        self._X_input = X
+        self._X = discretizer.fit_transform(X, out_of_core=chunk_size is not None, directory=cache_dir)
+        # array whose first rows hold the discretized data, grown geometrically by add_samples()
+        self._X_buffer = self._X
+        self._alphabet_sizes = discretizer.get_alphabet_sizes()
         self._Y = np.asarray(Y)
+        self._Y_codes, self._n_classes = mutual_information.encode_labels(self._Y)
+        # labels in the order of their codes
+        self._classes = np.unique(self._Y)
+        self._joint_counts = None
+        if keep_counts:
+            self._joint_counts = mutual_information.JointCounts(self._alphabet_sizes, self._n_classes)
+        self._histogram_estimator = HistogramEstimator(discretizer).fit_discretized(
+            self._X, self._alphabet_sizes, self._Y_codes, self._n_classes)
+        self._estimator = self._histogram_estimator
         
         self._method_str = method
+        self._bind_methods()
+        self._filter_criterion_kwargs = {}
+        self.change_method(method)
+        self._method = self._methods[method]
+
+        self._n_jobs = mutual_information.effective_n_jobs(n_jobs)
+        self._pool = None
+        self._sample_size = None
+        # sample weights of the histograms (only used by the bootstrap resamples of run_stability())
+        self._weights = None
+
+        self._cache_dir = cache_dir
+        self._cache_backend = cache_backend
+        self._class_cond_mi_method = self._calculate_class_conditional_MI
+        if estimator is None:
+            self._create_caches()
+        else:
+            self.change_MI_estimator(estimator)
+
+    def _bind_methods(self):
         self._methods = {
             "CIFE": self.__J_CIFE,
             "ICAP": self.__J_ICAP,
@@ -56,15 +168,73 @@ class FilterFeatureSelection(object):
             "mRMR": self.__J_mRMR,
             "MIFS": self.__J_MIFS
         }
-        self._filter_criterion_kwargs = {}
-        self.change_method(method)
-        self._method = self._methods[method]
-        self._mutual_information_estimator = lambda X1, X2: mutual_info_score(X1,X2)/np.log(2.0)
 
-        self._redundancy = np.zeros((self._n_features, self._n_features)) - 1.
-        self._relevancy = np.zeros((self._n_features)) - 1
-        self._class_cond_red = np.zeros((self._n_features, self._n_features)) - 1
-        self._class_cond_mi_method = self._calculate_class_conditional_MI
+    def __getstate__(self):
+        # bound methods of the criterion functions cannot be pickled (their names are mangled), they are bound again
+        # by __setstate__. Shared memory and worker processes are not transferred
+        state = self.__dict__.copy()
+        del state["_methods"]
+        del state["_method"]
+        if self._class_cond_mi_method == self._calculate_class_conditional_MI:
+            state["_class_cond_mi_method"] = None
+        state["_shared_caches"] = None
+        state["_pool"] = None
+        state["_X_buffer"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind_methods()
+        self._method = self._methods[self._method_str]
+        if self._class_cond_mi_method is None:
+            self._class_cond_mi_method = self._calculate_class_conditional_MI
+
+    def _create_caches(self):
+        """
+        Creates empty mutual information caches. Only the values of the default histogram estimator are stored in (and
+        reused from) the persistent caches in cache_dir. The stored greedy paths are discarded along with the caches
+        """
+        # selected features of previous runs, keyed by criterion and criterion kwargs (see run())
+        self._greedy_paths = {}
+        # keys of the paths that were selected before samples were added or removed (see _update_samples())
+        self._stale_paths = set()
+        # in-memory dense caches of the histogram estimator are placed in shared memory if there are worker processes,
+        # which then write their results directly into them (see _start_workers())
+        self._shared_caches = None
+        if (self._cache_dir is None and self._cache_backend == "dense" and self._n_jobs > 1 and
+                self._uses_histogram_estimator() and self._joint_counts is None):
+            self._shared_caches = [mutual_information.SharedArray(shape, fill_value=-1.) for shape in
+                                   [(self._n_features, ), (self._n_features, self._n_features),
+                                    (self._n_features, self._n_features)]]
+            self._relevancy = self._shared_caches[0].array
+            self._redundancy = mi_cache.DenseMICache(self._n_features, values=self._shared_caches[1].array)
+            self._class_cond_red = mi_cache.DenseMICache(self._n_features, values=self._shared_caches[2].array)
+        elif self._cache_dir is None or not self._uses_histogram_estimator():
+            self._redundancy = mi_cache.create_mi_cache(self._cache_backend, self._n_features)
+            self._relevancy = np.zeros((self._n_features)) - 1
+            self._class_cond_red = mi_cache.create_mi_cache(self._cache_backend, self._n_features)
+        else:
+            key = mi_cache.fingerprint([self._X, self._Y_codes], estimator="histogram")
+            self._relevancy, self._redundancy, self._class_cond_red = mi_cache.open_mi_cache(
+                self._cache_dir, key, self._n_features, self._cache_backend)
+            if self._class_cond_mi_method != self._calculate_class_conditional_MI:
+                self._class_cond_red = mi_cache.create_mi_cache(self._cache_backend, self._n_features)
+
+    def change_MI_estimator(self, estimator):
+        """
+        Changes the estimator of the mutual information. All previously computed values are discarded
+
+        :param estimator: MutualInformationEstimator (f.ex. estimators.KSGEstimator), which is fitted to the training
+                          data here. None restores the default histogram estimator
+        """
+        if estimator is None:
+            self._estimator = self._histogram_estimator
+        elif self._X_input is None:
+            raise ValueError("the raw data is not kept once samples were added or removed using the histogram "
+                             "estimator, so another estimator cannot be fitted")
+        else:
+            self._estimator = estimator.fit(self._X_input, self._Y)
+        self._create_caches()
 
     def change_method(self, method, **method_kwargs):
         """
@@ -92,15 +262,10 @@ class FilterFeatureSelection(object):
         return list(self._methods.keys())
 
     def _calculate_class_conditional_MI(self, X1, X2, Y):
-        states = np.unique(Y)
-        con_mi = 0.
+        return mutual_information.conditional_mutual_information(X1, X2, Y)
 
-        for state in states:
-            indices = (Y == state)
-            p_state = float(np.sum(indices)) / float(len(Y))
-            mi = self._mutual_information_estimator(X1[indices], X2[indices])
-            con_mi += p_state * mi
-        return con_mi
+    def _uses_histogram_estimator(self):
+        return self._estimator is self._histogram_estimator
 
     def _change_cmi_method(self, method):
         """
@@ -110,25 +275,232 @@ class FilterFeatureSelection(object):
         :return:
         """
         self._class_cond_mi_method = method
+        self._greedy_paths = {}
+        self._stale_paths = set()
+        if self._cache_dir is not None:
+            # values of a custom method must not end up in the persistent cache
+            self._class_cond_red = mi_cache.create_mi_cache(self._cache_backend, self._n_features)
 
     def _get_relevancy(self, feat_id):
         if self._relevancy[feat_id] == -1:
-            self._relevancy[feat_id] = self._mutual_information_estimator(self._X[:, feat_id], self._Y)
+            if self._uses_histogram_estimator() and self._joint_counts is not None:
+                self._compute_relevancies([feat_id])
+            elif self._uses_histogram_estimator():
+                # the features and labels are already encoded as histogram bins, so they are counted directly
+                self._relevancy[feat_id] = mutual_information.mutual_information(
+                    self._X[:, feat_id], self._Y_codes, (self._alphabet_sizes[feat_id], self._n_classes),
+                    self._weights)
+            else:
+                self._relevancy[feat_id] = self._estimator.relevancy([feat_id])[0]
         return self._relevancy[feat_id]
 
+    def _compute_relevancies(self, features=None):
+        """
+        Fills the relevancy cache for all requested features whose relevancy has not been computed yet. All missing
+        values are obtained in one vectorized pass over the data
+
+        :param features: feature ids. Default (None) uses all features
+        """
+        if features is None:
+            features = np.arange(self._n_features)
+        features = np.asarray(features, dtype=np.intp)
+        missing = features[self._relevancy[features] == -1]
+        if not self._uses_histogram_estimator():
+            if len(missing) > 0:
+                self._relevancy[missing] = self._estimator.relevancy(missing)
+        elif self._joint_counts is not None:
+            if len(missing) > 0:
+                self._joint_counts.count_relevancy(self._X, self._Y_codes, missing)
+                self._relevancy[missing] = self._joint_counts.relevancy(missing)
+        elif self._pool is not None and len(missing) >= self._n_jobs:
+            self._relevancy[missing] = self._pool.relevancy(missing)
+        elif len(missing) > 0:
+            self._relevancy[missing] = mutual_information.relevancy(self._X, self._alphabet_sizes, self._Y_codes,
+                                                                    self._n_classes, missing, weights=self._weights)
+        return self._relevancy[features]
+
+    def _start_workers(self):
+        """
+        Starts the worker processes (if n_jobs > 1). They share the discretized data and are reused for all mutual
+        information estimates until _stop_workers() is called
+        """
+        if (self._n_jobs > 1 and self._pool is None and self._uses_histogram_estimator() and
+                self._joint_counts is None):
+            self._pool = self._create_pool(self._n_jobs)
+
+    def _create_pool(self, n_jobs):
+        """
+        :return: SharedMemoryPool that writes its results into the shared caches (if there are any)
+        """
+        shared_caches = [None] * 3
+        if self._shared_caches is not None:
+            shared_caches = list(self._shared_caches)
+            if self._class_cond_mi_method != self._calculate_class_conditional_MI:
+                # the class conditional redundancy cache holds the values of the custom method
+                shared_caches[2] = None
+        return mutual_information.SharedMemoryPool(n_jobs, self._X, self._alphabet_sizes, self._Y_codes,
+                                                   self._n_classes, *shared_caches)
+
+    def _stop_workers(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _pairwise(self, feature, features, conditional=False):
+        """
+        Computes I(X_feature;X_i) (or I(X_feature;X_i|Y) if conditional is True) for all i in features, using the
+        worker processes if they are running
+        """
+        if self._pool is not None and len(features) >= self._n_jobs:
+            return self._pool.pairwise([feature], features, conditional)[0]
+        if conditional:
+            return mutual_information.pairwise_conditional_mutual_information(
+                self._X, self._alphabet_sizes, self._Y_codes, self._n_classes, [feature], features,
+                weights=self._weights)[0]
+        return mutual_information.pairwise_mutual_information(self._X, self._alphabet_sizes, [feature], features,
+                                                              weights=self._weights)[0]
+
+    def precompute_redundancy(self, n_jobs=None):
+        """
+        Eagerly computes the mutual information between all pairs of features. This is worthwhile if the selection is
+        run for many criteria or many numbers of features, as most of the redundancy matrix will be needed anyways.
+        Afterwards, all redundancy lookups during run() are plain array accesses.
+
+        :param n_jobs: number of worker processes used to compute the matrix. -1 uses all cpus. Default (None) uses
+                       the n_jobs value the selector was created with
+        """
+        if n_jobs is None:
+            n_jobs = self._n_jobs
+        if not self._uses_histogram_estimator() or self._joint_counts is not None:
+            for feature in range(self._n_features):
+                self._compute_redundancy(feature, np.arange(feature, self._n_features))
+        elif not self._redundancy.is_complete():
+            pool = self._pool
+            if pool is None and mutual_information.effective_n_jobs(n_jobs) > 1:
+                pool = self._create_pool(n_jobs)
+            try:
+                for rows, columns, values in mutual_information.redundancy_tiles(self._X, self._alphabet_sizes,
+                                                                                 n_jobs, pool=pool):
+                    self._redundancy.set(rows[:, None], columns[None, :], values)
+            finally:
+                if pool is not self._pool:
+                    pool.shutdown()
+
+    def _fill_pairwise(self, rows, columns, conditional=False):
+        """
+        Computes all missing values of the (conditional) redundancy between the features in rows and the features in
+        columns in a single batch
+
+        :param rows: array of feature ids
+        :param columns: array of feature ids
+        :param conditional: fill the class conditional redundancy instead of the redundancy
+        """
+        cache = self._class_cond_red if conditional else self._redundancy
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        columns = np.unique(np.asarray(columns, dtype=np.intp))
+        if len(rows) == 0 or len(columns) == 0:
+            return
+        missing = cache.get(rows[:, None], columns[None, :]) == -1
+        rows = rows[np.any(missing, axis=1)]
+        columns = columns[np.any(missing, axis=0)]
+        if len(columns) == 0:
+            return
+        if (not self._uses_histogram_estimator() or self._joint_counts is not None or
+                (conditional and self._class_cond_mi_method != self._calculate_class_conditional_MI)):
+            for row in rows:
+                if conditional:
+                    self._compute_class_cond_red(row, columns)
+                else:
+                    self._compute_redundancy(row, columns)
+        elif self._pool is not None and len(columns) >= self._n_jobs:
+            cache.set(rows[:, None], columns[None, :], self._pool.pairwise(rows, columns, conditional))
+        elif conditional:
+            cache.set(rows[:, None], columns[None, :], mutual_information.pairwise_conditional_mutual_information(
+                self._X, self._alphabet_sizes, self._Y_codes, self._n_classes, rows, columns, weights=self._weights))
+        else:
+            cache.set(rows[:, None], columns[None, :], mutual_information.pairwise_mutual_information(
+                self._X, self._alphabet_sizes, rows, columns, weights=self._weights))
+
     def _get_redundancy(self, feat1, feat2):
-        if self._redundancy[feat1, feat2] == -1:
-            this_redundancy = self._mutual_information_estimator(self._X[:, feat1], self._X[:, feat2])
-            self._redundancy[feat1, feat2] = this_redundancy
-            self._redundancy[feat2, feat1] = this_redundancy
-        return self._redundancy[feat1, feat2]
+        if self._redundancy.get(feat1, feat2) == -1:
+            if self._uses_histogram_estimator() and self._joint_counts is not None:
+                this_redundancy = self._compute_redundancy(feat1, [feat2])[0]
+            elif self._uses_histogram_estimator():
+                this_redundancy = mutual_information.mutual_information(
+                    self._X[:, feat1], self._X[:, feat2], self._alphabet_sizes[[feat1, feat2]], self._weights)
+            else:
+                this_redundancy = self._estimator.redundancy(feat1, feat2)[()]
+            self._redundancy.set(feat1, feat2, this_redundancy)
+        return self._redundancy.get(feat1, feat2)
+
+    def _compute_redundancy(self, feature, features):
+        """
+        Returns the redundancy between one feature and many others. All missing values are computed in one batch
+
+        :param feature: feature id
+        :param features: array of feature ids
+        :return: array containing I(X_feature;X_i) for each i in features
+        """
+        features = np.asarray(features, dtype=np.intp)
+        missing = features[self._redundancy.get(feature, features) == -1]
+        if len(missing) > 0:
+            if self._uses_histogram_estimator() and self._joint_counts is not None:
+                self._count_pairs(feature, missing)
+            elif self._uses_histogram_estimator():
+                self._redundancy.set(feature, missing, self._pairwise(feature, missing))
+            else:
+                self._redundancy.set(feature, missing, self._estimator.redundancy(feature, missing))
+        return self._redundancy.get(feature, features)
+
+    def _compute_class_cond_red(self, feature, features):
+        """
+        Returns the class conditional redundancy between one feature and many others. All missing values are computed
+        in one batch
+
+        :param feature: feature id
+        :param features: array of feature ids
+        :return: array containing I(X_feature;X_i|Y) for each i in features
+        """
+        features = np.asarray(features, dtype=np.intp)
+        missing = features[self._class_cond_red.get(feature, features) == -1]
+        if len(missing) > 0:
+            if self._class_cond_mi_method != self._calculate_class_conditional_MI:
+                for other in missing:
+                    self._get_class_cond_red(feature, other)
+            elif self._uses_histogram_estimator() and self._joint_counts is not None:
+                self._count_pairs(feature, missing)
+            elif self._uses_histogram_estimator():
+                self._class_cond_red.set(feature, missing, self._pairwise(feature, missing, conditional=True))
+            else:
+                self._class_cond_red.set(feature, missing, self._estimator.conditional_redundancy(feature, missing))
+        return self._class_cond_red.get(feature, features)
+
+    def _count_pairs(self, feature, features):
+        """
+        Counts and keeps the joint histograms of feature with each of the given features, and stores both the
+        redundancy and the class conditional redundancy derived from them
+        """
+        self._joint_counts.count_pairs(self._X, self._Y_codes, feature, features)
+        redundancy, class_cond_red = self._joint_counts.pairwise(feature, features)
+        self._redundancy.set(feature, features, redundancy)
+        if self._class_cond_mi_method == self._calculate_class_conditional_MI:
+            self._class_cond_red.set(feature, features, class_cond_red)
 
     def _get_class_cond_red(self, feat1, feat2):
-        if self._class_cond_red[feat1, feat2] == -1:
-            this_class_cond_red = self._class_cond_mi_method(self._X[:, feat1], self._X[:, feat2], self._Y)
-            self._class_cond_red[feat1, feat2] = this_class_cond_red
-            self._class_cond_red[feat2, feat1] = this_class_cond_red
-        return self._class_cond_red[feat1, feat2]
+        if self._class_cond_red.get(feat1, feat2) == -1:
+            if self._class_cond_mi_method != self._calculate_class_conditional_MI:
+                this_class_cond_red = self._class_cond_mi_method(self._X[:, feat1], self._X[:, feat2], self._Y)
+            elif self._uses_histogram_estimator() and self._joint_counts is not None:
+                this_class_cond_red = self._compute_class_cond_red(feat1, [feat2])[0]
+            elif self._uses_histogram_estimator():
+                # the label codes were computed once on construction, only the joint histogram is left to do
+                this_class_cond_red = mutual_information.conditional_mutual_information(
+                    self._X[:, feat1], self._X[:, feat2], self._Y_codes,
+                    (self._alphabet_sizes[feat1], self._alphabet_sizes[feat2], self._n_classes), self._weights)
+            else:
+                this_class_cond_red = self._estimator.conditional_redundancy(feat1, feat2)[()]
+            self._class_cond_red.set(feat1, feat2, this_class_cond_red)
+        return self._class_cond_red.get(feat1, feat2)
 
     def __J_MIFS(self, features_in_set, feature_to_be_tested, beta=1):
         relevancy = self._get_relevancy(feature_to_be_tested)
@@ -208,49 +580,635 @@ class FilterFeatureSelection(object):
             j = relevancy
         return j
 
+    def _penalty_terms(self, feature, candidates, method=None):
+        """
+        Computes the contribution of a newly selected feature to the penalty term of the current criterion for each
+        candidate. Missing mutual information values are computed in one batch
+
+        :param feature: id of the feature that was just added to the set
+        :param candidates: array of feature ids that are not in the set
+        :param method: criterion (as string). Default (None) uses the current criterion
+        :return: array containing the penalty term of each candidate
+        """
+        if method is None:
+            method = self._method_str
+        redundancy = self._compute_redundancy(feature, candidates)
+        if method in ["MIFS", "mRMR"]:
+            return redundancy
+        terms = redundancy - self._compute_class_cond_red(feature, candidates)
+        if method == "ICAP":
+            terms = np.maximum(0., terms)
+        return terms
+
+    def _evaluate_penalty(self, relevancy, penalty, n_features_in_set, method=None, method_kwargs=None):
+        """
+        Vectorized counterpart of the criterion functions. Evaluates the current criterion for many candidates at once
+
+        :param relevancy: array containing the relevancy of each candidate
+        :param penalty: array containing the accumulated penalty term of each candidate
+        :param n_features_in_set: number of features in the current set
+        :param method: criterion (as string). Default (None) uses the current criterion and its kwargs
+        :param method_kwargs: dict of kwargs of the criterion (f.ex. beta of "MIFS")
+        :return: array containing the criterion value of each candidate
+        """
+        if method is None:
+            method = self._method_str
+            method_kwargs = self._filter_criterion_kwargs
+        if n_features_in_set == 0:
+            return relevancy
+        if method in ["mRMR", "JMI"]:
+            return relevancy - 1./float(n_features_in_set) * penalty
+        if method == "MIFS":
+            return relevancy - (method_kwargs or {}).get("beta", 1) * penalty
+        return relevancy - penalty
+
     def _evaluate_feature(self, features_in_set, feature_to_be_tested):
         return self._method(features_in_set, feature_to_be_tested, **self._filter_criterion_kwargs)
 
-    def run(self, n_features_to_select):
+    def _greedy_selection(self, n_features_to_select, relevancy, current_feature_set=(), candidates=None):
+        """
+        Greedy forward selection that evaluates the current criterion for all candidates in every step
+
+        :param n_features_to_select: number of features to select
+        :param relevancy: array containing the relevancy of every feature
+        :param current_feature_set: features selected in previous steps, the search continues from this set
+        :param candidates: feature ids the search may select from. Default (None) uses all features
+        :return: list of selected feature ids
+        """
+        current_feature_set = list(current_feature_set)
+        for _ in self._greedy_steps(n_features_to_select, relevancy, current_feature_set, self._method_str,
+                                    self._filter_criterion_kwargs, candidates):
+            pass
+        return current_feature_set
+
+    def _candidates(self, current_feature_set, candidates=None):
+        """
+        :return: sorted array of the candidates (default: all features) that are not in current_feature_set
+        """
+        if candidates is None:
+            return np.delete(np.arange(self._n_features), current_feature_set)
+        return np.setdiff1d(np.asarray(candidates, dtype=np.intp), current_feature_set)
+
+    def _greedy_steps(self, n_features_to_select, relevancy, current_feature_set, method, method_kwargs,
+                      candidates=None):
+        """
+        Generator that performs the greedy search of _greedy_selection for the given criterion. Whenever the penalty
+        terms of a feature of the set are needed, it first yields the feature and the remaining candidates, so that
+        the caller can compute the missing mutual information values in advance (see run_many).
+
+        :param n_features_to_select: number of features to select
+        :param relevancy: array containing the relevancy of every feature
+        :param current_feature_set: list of features selected in previous steps. It is extended in place
+        :param method: criterion (as string)
+        :param method_kwargs: dict of kwargs of the criterion
+        :param candidates: feature ids the search may select from. Default (None) uses all features
+        """
+        # the penalty term of every criterion is a sum (or a maximum for CMIM) over the features in the set. It is
+        # therefore kept per candidate and only updated by the term of the most recently selected feature
+        if method == "CMIM":
+            penalty = np.zeros(self._n_features) - np.inf
+        else:
+            penalty = np.zeros(self._n_features)
+
+        candidates = self._candidates(current_feature_set, candidates)
+        n_features_with_terms = 0
+        while True:
+            if len(current_feature_set) >= n_features_to_select or len(candidates) == 0:
+                break
+            # features that were added to the set since the last update
+            for feature in current_feature_set[n_features_with_terms:]:
+                yield feature, candidates
+                terms = self._penalty_terms(feature, candidates, method)
+                if method == "CMIM":
+                    penalty[candidates] = np.maximum(penalty[candidates], terms)
+                else:
+                    penalty[candidates] += terms
+            n_features_with_terms = len(current_feature_set)
+
+            j_candidates = self._evaluate_penalty(relevancy[candidates], penalty[candidates], len(current_feature_set),
+                                                  method, method_kwargs)
+            best_id = np.argmax(j_candidates)
+            best_J = j_candidates[best_id]
+            if not best_J > -999999.9:
+                break
+            best_feature = candidates[best_id]
+            logger.info("Best feature found was %d with J_eval= %f. Feature set was %s"%(best_feature, best_J, str(current_feature_set)))
+            current_feature_set += [best_feature]
+            candidates = np.delete(candidates, best_id)
+
+    def _lazy_cmim_selection(self, n_features_to_select, relevancy, current_feature_set=(), candidates=None):
+        """
+        CMIM with lazy evaluation [Fleuret2004]. The CMIM score of a candidate can only decrease when features are
+        added to the set, so a partial score that only accounts for the first features of the set is an upper bound
+        of its actual score. Candidates are kept in a max-heap of partial scores and only the candidate at the top is
+        updated with the features that were added since its last evaluation. A candidate whose score is up to date
+        when it reaches the top is the best feature.
+
+        :param n_features_to_select: number of features to select
+        :param relevancy: array containing the relevancy of every feature
+        :param current_feature_set: features selected in previous steps, the search continues from this set
+        :param candidates: feature ids the search may select from. Default (None) uses all features
+        :return: list of selected feature ids
+        """
+        current_feature_set = list(current_feature_set)
+        candidates = self._candidates(current_feature_set, candidates)
+        if len(current_feature_set) == 0 and n_features_to_select > 0 and len(candidates) > 0:
+            best_feature = int(candidates[np.argmax(relevancy[candidates])])
+            candidates = candidates[candidates != best_feature]
+            logger.info("Best feature found was %d with J_eval= %f. Feature set was %s"%(best_feature, relevancy[best_feature], str(current_feature_set)))
+            current_feature_set += [best_feature]
+        if len(current_feature_set) >= n_features_to_select:
+            return current_feature_set
+
+        # without any feature in the set the score is the relevancy, which is no upper bound because the conditional
+        # terms may be negative. Hence all candidates are evaluated against the features in the set (in one batch each)
+        penalty = np.zeros(self._n_features) - np.inf
+        for feature in current_feature_set:
+            penalty[candidates] = np.maximum(penalty[candidates], self._penalty_terms(feature, candidates))
+        n_evaluated = np.zeros(self._n_features, dtype=int) + len(current_feature_set)
+        heap = [(-(relevancy[c] - penalty[c]), c) for c in candidates]
+        heapq.heapify(heap)
+
+        while len(current_feature_set) < n_features_to_select and len(heap) > 0:
+            negative_J, candidate = heapq.heappop(heap)
+            if n_evaluated[candidate] < len(current_feature_set):
+                new_features = current_feature_set[n_evaluated[candidate]:]
+                terms = (self._compute_redundancy(candidate, new_features) -
+                         self._compute_class_cond_red(candidate, new_features))
+                penalty[candidate] = max(penalty[candidate], np.max(terms))
+                n_evaluated[candidate] = len(current_feature_set)
+                heapq.heappush(heap, (-(relevancy[candidate] - penalty[candidate]), candidate))
+                continue
+            if not -negative_J > -999999.9:
+                break
+            logger.info("Best feature found was %d with J_eval= %f. Feature set was %s"%(candidate, -negative_J, str(current_feature_set)))
+            current_feature_set += [candidate]
+        return current_feature_set
+
+    def _pruned_selection(self, n_features_to_select, relevancy, current_feature_set=(), candidates=None):
+        """
+        Greedy forward selection with bound-and-prune candidate scans. For ICAP, MIFS and mRMR all terms of the penalty
+        are non-negative, so evaluating the criterion with the penalty accumulated over only the first features of the
+        set yields an upper bound of the candidate's score (for the empty penalty that is its relevancy). In each step
+        the candidates are visited in descending order of this bound and only the visited ones are updated with the
+        missing terms. The scan stops as soon as the bound falls below the best score found.
+
+        :param n_features_to_select: number of features to select
+        :param relevancy: array containing the relevancy of every feature
+        :param current_feature_set: features selected in previous steps, the search continues from this set
+        :param candidates: feature ids the search may select from. Default (None) uses all features
+        :return: list of selected feature ids
+        """
+        penalty = np.zeros(self._n_features)
+        n_evaluated = np.zeros(self._n_features, dtype=int)
+        current_feature_set = list(current_feature_set)
+        candidates = self._candidates(current_feature_set, candidates)
+        while len(current_feature_set) < n_features_to_select and len(candidates) > 0:
+            n_in_set = len(current_feature_set)
+            bounds = self._evaluate_penalty(relevancy[candidates], penalty[candidates], n_in_set)
+            best_J = -999999.9
+            best_feature = None
+            for candidate_id in np.lexsort((candidates, -bounds)):
+                candidate = candidates[candidate_id]
+                if bounds[candidate_id] < best_J:
+                    break
+                if bounds[candidate_id] == best_J and best_feature is not None and candidate > best_feature:
+                    continue
+                if n_evaluated[candidate] < n_in_set:
+                    # accumulate in the order of the set to obtain exactly the same sums as the exhaustive search
+                    for term in self._penalty_terms(candidate, current_feature_set[n_evaluated[candidate]:]):
+                        penalty[candidate] += term
+                    n_evaluated[candidate] = n_in_set
+                j_feature = self._evaluate_penalty(relevancy[candidate], penalty[candidate], n_in_set)
+                if j_feature > best_J or (j_feature == best_J and best_feature is not None and candidate < best_feature):
+                    best_J = j_feature
+                    best_feature = candidate
+            if best_feature is None:
+                break
+            logger.info("Best feature found was %d with J_eval= %f. Feature set was %s"%(best_feature, best_J, str(current_feature_set)))
+            current_feature_set += [best_feature]
+            candidates = candidates[candidates != best_feature]
+        return current_feature_set
+
+    def run(self, n_features_to_select, lazy=False):
         """
         Performs the actual feature selection using the specified filter criterion
 
         :param n_features_to_select: number of features to select
+        :param lazy: only evaluate the candidates that may still be the best feature (see _lazy_cmim_selection and
+                     _pruned_selection). Yields the same features but requires far fewer mutual information estimates
+                     on wide data. Supported for "CMIM", "ICAP", "mRMR" and "MIFS" (with beta >= 0); the other
+                     criteria may favour candidates with negative penalty terms and ignore this option
         :return: numpy array of selected features (as IDs)
+
+        The selected features are remembered per criterion (and criterion kwargs). A later run of the same criterion
+        returns a prefix of them if fewer features are requested, or continues the greedy search from them otherwise.
         """
         logger.info("Initialize filter feature selection:")
         logger.info("using filter method: %s"%self._method_str)
 
-        def find_next_best_feature(current_feature_set):
-            features_not_in_set = set(np.arange(self._n_features)).difference(set(current_feature_set))
-            best_J = -999999.9
-            best_feature = None
-            for feature_candidate in features_not_in_set:
-                j_feature = self._evaluate_feature(current_feature_set, feature_candidate)
-                if j_feature > best_J:
-                    best_J = j_feature
-                    best_feature = feature_candidate
-            if best_feature is not None:
-                logger.info("Best feature found was %d with J_eval= %f. Feature set was %s"%(best_feature, best_J, str(current_feature_set)))
-            return best_feature
+        if n_features_to_select > self._n_features:
+            raise ValueError("n_features_to_select must be smaller or equal to the number of features")
+
+        path_key = (self._method_str, tuple(sorted(self._filter_criterion_kwargs.items())))
+        current_feature_set = self._greedy_paths.get(path_key, [])
+        if n_features_to_select <= len(current_feature_set) and path_key not in self._stale_paths:
+            current_feature_set = current_feature_set[:n_features_to_select]
+        else:
+            self._start_workers()
+            try:
+                relevancy = self._compute_relevancies()
+                if path_key in self._stale_paths:
+                    self._stale_paths.discard(path_key)
+                    if lazy:
+                        # the lazy searches cannot stop at the first feature that differs from the stored path, so
+                        # replaying it would cost as much as selecting anew
+                        current_feature_set = []
+                    else:
+                        current_feature_set = self._valid_prefix(current_feature_set[:n_features_to_select], relevancy,
+                                                                 self._method_str, self._filter_criterion_kwargs)
+                if len(current_feature_set) > 0:
+                    logger.info("Continuing from the stored feature set %s"%str(current_feature_set))
+                current_feature_set = self._select(n_features_to_select, relevancy, current_feature_set, lazy)
+            finally:
+                self._stop_workers()
+            self._greedy_paths[path_key] = current_feature_set
+
+        logger.info("Filter feature selection done. Final set is: %s"%str(current_feature_set))
+        self._sample_size = self._X.shape[0]
 
+        return np.array(current_feature_set)
+
+    def _select(self, n_features_to_select, relevancy, current_feature_set, lazy, candidates=None):
+        """
+        Runs the greedy search of the current criterion, with lazy evaluation if requested and supported (see run())
+        """
+        if lazy and self._method_str == "CMIM":
+            return self._lazy_cmim_selection(n_features_to_select, relevancy, current_feature_set, candidates)
+        if lazy and (self._method_str in ["ICAP", "mRMR"] or
+                     (self._method_str == "MIFS" and self._filter_criterion_kwargs.get("beta", 1) >= 0)):
+            return self._pruned_selection(n_features_to_select, relevancy, current_feature_set, candidates)
+        return self._greedy_selection(n_features_to_select, relevancy, current_feature_set, candidates)
+
+    def run_grouped(self, n_features_to_select, groups, n_groups_to_select=None, lazy=False):
+        """
+        Hierarchical feature selection for features that come in groups (f.ex. all features of one filter type and
+        scale, or of one channel). First the groups are selected by running the current criterion on one
+        representative per group, its most relevant feature. The features are then selected from the members of the
+        selected groups only. Pairwise mutual information is thus only needed between the representatives and within
+        the selected groups, instead of between all features.
+
+        :param n_features_to_select: number of features to select
+        :param groups: (n_features) array containing the group (any label) of each feature
+        :param n_groups_to_select: number of groups to select. Default (None) uses n_features_to_select (or the number
+                                   of groups, if smaller)
+        :param lazy: only evaluate the candidates that may still be the best feature (see run())
+        :return: numpy array of selected features (as IDs)
+        """
+        groups = np.asarray(groups)
+        if groups.shape != (self._n_features, ):
+            raise ValueError("groups must contain the group of each of the %d features" % self._n_features)
         if n_features_to_select > self._n_features:
             raise ValueError("n_features_to_select must be smaller or equal to the number of features")
+        group_labels, group_ids = np.unique(groups, return_inverse=True)
+        if n_groups_to_select is None:
+            n_groups_to_select = min(n_features_to_select, len(group_labels))
+        if n_groups_to_select > len(group_labels):
+            raise ValueError("n_groups_to_select must be smaller or equal to the number of groups (%d)" %
+                             len(group_labels))
 
-        selected_features = 0
-        current_feature_set = []
-        while selected_features < n_features_to_select:
-            best_feature = find_next_best_feature(current_feature_set)
-            if best_feature is not None:
-                current_feature_set += [best_feature]
-                selected_features += 1
-            else:
-                break
+        self._start_workers()
+        try:
+            relevancy = self._compute_relevancies()
+            # the most relevant feature (the lowest id among equally relevant ones) represents its group
+            order = np.lexsort((np.arange(self._n_features), -relevancy, group_ids))
+            first = np.concatenate([[True], group_ids[order][1:] != group_ids[order][:-1]])
+            representatives = order[first]
+            selected_representatives = self._select(n_groups_to_select, relevancy, [], lazy, representatives)
+            selected_groups = group_ids[selected_representatives]
+            logger.info("Selected groups: %s"%str(list(group_labels[selected_groups])))
+
+            members = np.flatnonzero(np.isin(group_ids, selected_groups))
+            if n_features_to_select > len(members):
+                raise ValueError("the %d selected groups contain only %d features" % (len(selected_groups),
+                                                                                      len(members)))
+            current_feature_set = self._select(n_features_to_select, relevancy, [], lazy, members)
+        finally:
+            self._stop_workers()
 
         logger.info("Filter feature selection done. Final set is: %s"%str(current_feature_set))
+        self._sample_size = self._X.shape[0]
 
         return np.array(current_feature_set)
 
+    def run_many(self, methods, n_features_to_select, method_kwargs=None):
+        """
+        Performs the feature selection for several criteria at once. The greedy searches of all criteria advance
+        together, step by step, and the mutual information values that any of them is missing in a step are computed
+        in one batch. Selects the same features as calling run() for each criterion. The results are remembered like
+        those of run()
+
+        :param methods: list of criteria (as strings), f.ex. get_available_methods()
+        :param n_features_to_select: number of features to select
+        :param method_kwargs: dict mapping criteria to dicts of their kwargs (f.ex. {"MIFS": {"beta": 0.5}})
+        :return: dict mapping each criterion to the numpy array of its selected features (as IDs)
+        """
+        for method in methods:
+            if method not in list(self._methods.keys()):
+                raise ValueError("method must be one of the following: %s"%str(list(self._methods.keys())))
+        if n_features_to_select > self._n_features:
+            raise ValueError("n_features_to_select must be smaller or equal to the number of features")
+        if method_kwargs is None:
+            method_kwargs = {}
+
+        paths = {}
+        searches = {}
+        self._start_workers()
+        try:
+            relevancy = self._compute_relevancies()
+            for method in methods:
+                kwargs = method_kwargs.get(method, {})
+                path_key = (method, tuple(sorted(kwargs.items())))
+                paths[method] = list(self._greedy_paths.get(path_key, []))
+                if path_key in self._stale_paths:
+                    self._stale_paths.discard(path_key)
+                    paths[method] = self._valid_prefix(paths[method], relevancy, method, kwargs)
+                    self._greedy_paths[path_key] = paths[method]
+                if n_features_to_select > len(paths[method]):
+                    searches[method] = (path_key, self._greedy_steps(n_features_to_select, relevancy, paths[method],
+                                                                     method, kwargs))
+            while len(searches) > 0:
+                requests = []
+                for method in list(searches.keys()):
+                    path_key, steps = searches[method]
+                    try:
+                        requests += [(method, ) + next(steps)]
+                    except StopIteration:
+                        self._greedy_paths[path_key] = paths[method]
+                        del searches[method]
+                if len(requests) == 0:
+                    break
+                columns = np.concatenate([candidates for _, _, candidates in requests])
+                self._fill_pairwise([feature for _, feature, _ in requests], columns)
+                self._fill_pairwise([feature for method, feature, _ in requests if method not in ["MIFS", "mRMR"]],
+                                    columns, conditional=True)
+        finally:
+            self._stop_workers()
+        self._sample_size = self._X.shape[0]
+
+        return dict((method, np.array(paths[method][:n_features_to_select])) for method in methods)
+
+    def run_approximate(self, n_features_to_select, initial_sample_size=10000, growth_factor=2, n_stable=2,
+                        lazy=False, random_state=0):
+        """
+        Performs the feature selection on stratified subsamples of the training data. The mutual information is
+        estimated from a random subsample that contains the classes in the same proportions as the whole data. The
+        sample is grown by growth_factor (each sample contains the previous one) until n_stable consecutive samples
+        select the same features in the same order, or until all samples are used. The number of samples the returned
+        selection is based on is available via get_sample_size().
+
+        :param n_features_to_select: number of features to select
+        :param initial_sample_size: number of samples of the first subsample
+        :param growth_factor: factor by which the sample grows in each round
+        :param n_stable: number of consecutive samples that have to agree on the selection
+        :param lazy: see run()
+        :param random_state: seed of the random subsamples
+        :return: numpy array of selected features (as IDs)
+        """
+        if growth_factor <= 1:
+            raise ValueError("growth_factor must be larger than 1")
+        n_samples = self._X.shape[0]
+        order = _stratified_order(self._Y_codes, self._n_classes, random_state)
+        sample_size = min(initial_sample_size, n_samples)
+        selections = []
+        while True:
+            if sample_size == n_samples:
+                return self.run(n_features_to_select, lazy)
+            selection = self._subsample_selector(np.sort(order[:sample_size])).run(n_features_to_select, lazy)
+            logger.info("Selection on %d samples: %s"%(sample_size, str(selection)))
+            selections += [selection]
+            if len(selections) >= n_stable and all(np.array_equal(selections[-1], other)
+                                                   for other in selections[-n_stable:]):
+                self._sample_size = sample_size
+                return selection
+            sample_size = min(int(np.ceil(sample_size * growth_factor)), n_samples)
+
+    def _subsample_selector(self, samples):
+        """
+        :param samples: sorted sample ids
+        :return: FilterFeatureSelection with the configuration of this one for a subset of the samples. It takes the
+                 rows of the already discretized data, so the subsample is binned like the whole data. The raw data is
+                 only read (chunk by chunk) if the estimator needs it
+        """
+        # the copy is made through __getstate__ and __setstate__, which bind the criterion functions to it
+        selector = copy.copy(self)
+        selector._X = np.array(self._X[samples], order="F")
+        selector._Y = self._Y[samples]
+        selector._Y_codes = self._Y_codes[samples]
+        selector._X_input = None
+        selector._histogram_estimator = HistogramEstimator(self._discretizer).fit_discretized(
+            selector._X, self._alphabet_sizes, selector._Y_codes, self._n_classes)
+        if self._uses_histogram_estimator():
+            selector._estimator = selector._histogram_estimator
+        else:
+            selector._X_input = read_rows(self._X_input, samples)
+            selector._estimator = copy.copy(self._estimator).fit(selector._X_input, selector._Y)
+        selector._joint_counts = None
+        selector._weights = None
+        selector._cache_dir = None
+        selector._create_caches()
+        return selector
+
+    def run_stability(self, n_features_to_select, n_resamples=100, sample_fraction=1., lazy=False, random_state=0):
+        """
+        Stability selection [Meinshausen2010]: runs the current criterion on bootstrap resamples of the training data
+        and reports how often each feature is selected. A resample is not a copy of the data but the number of times
+        each sample was drawn, with which the histograms of the discretized data are weighted. The resamples are
+        processed by n_jobs worker processes that share the discretized data.
+
+        :param n_features_to_select: number of features to select in each resample
+        :param n_resamples: number of bootstrap resamples
+        :param sample_fraction: size of the resamples (drawn with replacement) relative to the number of samples
+        :param lazy: only evaluate the candidates that may still be the best feature (see run())
+        :param random_state: seed of the resamples. The result does not depend on n_jobs
+        :return: (n_features) array containing the fraction of resamples in which each feature was selected
+        """
+        if n_features_to_select > self._n_features:
+            raise ValueError("n_features_to_select must be smaller or equal to the number of features")
+        n_draws = max(1, int(round(sample_fraction * self._X.shape[0])))
+        seeds = np.random.RandomState(random_state).randint(np.iinfo(np.int32).max, size=n_resamples)
+        selector = self._bootstrap_selector()
+        n_jobs = min(self._n_jobs, n_resamples)
+        # out-of-core data is processed in this process only, it would have to be loaded into shared memory otherwise
+        if n_jobs > 1 and not isinstance(self._X, np.memmap):
+            from concurrent.futures import ProcessPoolExecutor
+            data = [mutual_information.SharedArray.from_array(self._X, order="F"),
+                    mutual_information.SharedArray.from_array(self._Y_codes)]
+            selector._X = None
+            selector._Y_codes = None
+            with ProcessPoolExecutor(n_jobs, initializer=_init_bootstrap_worker,
+                                     initargs=(selector, data[0].descriptor, data[1].descriptor)) as executor:
+                selections = list(executor.map(_bootstrap_task, [n_features_to_select] * n_resamples,
+                                                [lazy] * n_resamples, [n_draws] * n_resamples, seeds))
+        else:
+            selections = [_bootstrap_selection(selector, n_features_to_select, lazy, n_draws, seed) for seed in seeds]
+        counts = np.zeros(self._n_features)
+        for resample, selection in enumerate(selections):
+            logger.info("Selection on bootstrap resample %d: %s"%(resample, str(selection)))
+            counts[selection] += 1
+        return counts / float(max(n_resamples, 1))
+
+    def _bootstrap_selector(self):
+        """
+        :return: FilterFeatureSelection with the configuration of this one that shares its discretized data. It keeps
+                 its (in-memory) caches for itself and uses no workers, see _bootstrap_selection()
+        """
+        if (not self._uses_histogram_estimator() or
+                self._class_cond_mi_method != self._calculate_class_conditional_MI):
+            raise ValueError("stability selection is only supported for the default histogram estimator")
+        # the copy is made through __getstate__ and __setstate__, which bind the criterion functions to it
+        selector = copy.copy(self)
+        selector._histogram_estimator = selector._estimator = HistogramEstimator(self._discretizer)
+        selector._X_input = None
+        selector._Y = None
+        selector._joint_counts = None
+        selector._n_jobs = 1
+        selector._cache_dir = None
+        selector._greedy_paths = {}
+        selector._relevancy = selector._redundancy = selector._class_cond_red = None
+        return selector
+
+    def get_sample_size(self):
+        """
+        Returns the number of samples the last selection was based on
+        :return: number of samples (None if no selection was run yet)
+        """
+        return self._sample_size
+
+    def add_samples(self, X_new, Y_new):
+        """
+        Adds training samples (f.ex. newly labelled pixels). The new samples are discretized with the bins of the
+        existing data (values outside of them fall into the outermost bins). If the selector keeps its joint
+        histograms (keep_counts), all mutual information values are updated by counting only the new samples;
+        otherwise they are recomputed when needed. Previously selected feature sets are checked by the next run() (or
+        run_many()) of their criterion, and only kept up to the first feature that the greedy search would no longer
+        select. With the default histogram estimator only the discretized samples are kept, the raw data is not.
+
+        :param X_new: (n_new_samples, n_features) numpy array containing the new training data
+        :param Y_new: (n_new_samples) numpy array containing their labels (which may include new labels)
+        """
+        X_new = np.asarray(X_new)
+        Y_new = np.asarray(Y_new)
+        if X_new.ndim != 2 or X_new.shape[1] != self._n_features:
+            raise ValueError("X_new must have %d features" % self._n_features)
+        if X_new.shape[0] != len(Y_new):
+            raise ValueError("X_new must have as many samples as there are labels in Y_new")
+        self._check_in_memory()
+
+        new_classes = np.setdiff1d(np.unique(Y_new), self._classes)
+        if len(new_classes) > 0:
+            self._classes = np.concatenate([self._classes, new_classes])
+            self._n_classes = len(self._classes)
+            if self._joint_counts is not None:
+                self._joint_counts.add_classes(self._n_classes)
+        sorter = np.argsort(self._classes, kind="stable")
+        y_new = sorter[np.searchsorted(self._classes, Y_new, sorter=sorter)].astype(np.intp)
+        n_samples = self._X.shape[0]
+        buffer = self._sample_buffer(n_samples + X_new.shape[0])
+        states = self._discretizer.transform(X_new, out=buffer[n_samples:n_samples + X_new.shape[0]])
+        if self._joint_counts is not None:
+            self._joint_counts.update(states, y_new)
+
+        X_input = None
+        if not self._uses_histogram_estimator():
+            X_input = np.concatenate([self._X_input, X_new])
+        self._update_samples(buffer[:n_samples + X_new.shape[0]], X_input, np.concatenate([self._Y, Y_new]),
+                             np.concatenate([self._Y_codes, y_new]))
+
+    def remove_samples(self, samples):
+        """
+        Removes training samples. Updates the mutual information values like add_samples()
+
+        :param samples: ids (or boolean mask) of the samples to remove
+        """
+        self._check_in_memory()
+        keep = np.ones(self._X.shape[0], dtype=bool)
+        keep[samples] = False
+        if self._joint_counts is not None:
+            self._joint_counts.update(self._X[~keep], self._Y_codes[~keep], sign=-1)
+        # the kept samples are moved to the front of the buffer, column by column
+        n_kept = int(np.count_nonzero(keep))
+        buffer = self._sample_buffer(n_kept)
+        for feature in range(self._n_features):
+            buffer[:n_kept, feature] = self._X[keep, feature]
+
+        X_input = None
+        if not self._uses_histogram_estimator():
+            X_input = self._X_input[keep]
+        self._update_samples(buffer[:n_kept], X_input, self._Y[keep], self._Y_codes[keep])
+
+    def _check_in_memory(self):
+        if isinstance(self._X, np.memmap):
+            raise ValueError("samples cannot be added to or removed from out-of-core data")
+
+    def _sample_buffer(self, n_samples):
+        """
+        :return: Fortran order array with room for (at least) n_samples discretized samples, whose first rows hold the
+                 current ones. It grows by (at least) a factor of two, so that adding samples takes amortized constant
+                 time per new sample and feature
+        """
+        in_buffer = self._X_buffer is not None and (self._X is self._X_buffer or self._X.base is self._X_buffer)
+        if not in_buffer or self._X_buffer.shape[0] < n_samples:
+            n_rows = max(n_samples, 2 * self._X.shape[0])
+            buffer = np.empty((n_rows, self._n_features), dtype=self._X.dtype, order="F")
+            buffer[:self._X.shape[0]] = self._X
+            self._X_buffer = buffer
+        return self._X_buffer
+
+    def _update_samples(self, X, X_input, Y, Y_codes):
+        """
+        Replaces the (discretized) data and renews the caches (from the kept joint histograms, if any). The stored
+        greedy paths are kept, but marked to be checked by the next run of their criterion (see _valid_prefix())
+        """
+        self._X = X
+        self._X_input = X_input
+        self._Y = Y
+        self._Y_codes = Y_codes
+        self._histogram_estimator.fit_discretized(self._X, self._alphabet_sizes, self._Y_codes, self._n_classes)
+        if not self._uses_histogram_estimator():
+            self._estimator = self._estimator.fit(self._X_input, self._Y)
+
+        greedy_paths = self._greedy_paths
+        self._create_caches()
+        if self._joint_counts is not None:
+            features = self._joint_counts.features()
+            self._relevancy[features] = self._joint_counts.relevancy(features)
+            for feature, others, redundancy, class_cond_red in self._joint_counts.pairs():
+                self._redundancy.set(feature, others, redundancy)
+                if self._class_cond_mi_method == self._calculate_class_conditional_MI:
+                    self._class_cond_red.set(feature, others, class_cond_red)
+
+        self._greedy_paths = greedy_paths
+        self._stale_paths = set(greedy_paths.keys())
+
+    def _valid_prefix(self, path, relevancy, method, method_kwargs):
+        """
+        Replays the greedy search along a previously selected feature set, up to the first feature it no longer
+        selects
+
+        :return: the longest prefix of path that the greedy search still selects
+        """
+        replay = []
+        for _ in self._greedy_steps(len(path), relevancy, replay, method, method_kwargs):
+            # the search yields every newly selected feature before it computes its penalty terms
+            if replay != path[:len(replay)]:
+                break
+        n_valid = 0
+        while n_valid < min(len(replay), len(path)) and replay[n_valid] == path[n_valid]:
+            n_valid += 1
+        logger.info("%s: %d of %d previously selected features are still valid"%(method, n_valid, len(path)))
+        return path[:n_valid]
+
 
 
 # Francois Fleuret. Fast Binary Feature Selection with Conditional Mutual Informa-
@@ -272,3 +1230,6 @@ class FilterFeatureSelection(object):
 # H C Peng, F H Long, and C Ding. Feature selection based on mutual information:
 # Criteria of max-dependency, max-relevance, and min-redundancy. Ieee Transactions
 # on Pattern Analysis and Machine Intelligence, 27(8):1226 1238, 2005.
+
+# Nicolai Meinshausen and Peter Buehlmann. Stability selection. Journal of the Royal Statistical Society: Series B
+# (Statistical Methodology), 72(4):417 473, 2010.
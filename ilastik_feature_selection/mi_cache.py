@@ -0,0 +1,234 @@
+__author__ = 'fabian'
+
+import os
+import numpy as np
+from . import utils
+
+# increase whenever the way cached values are computed changes, so that stale cache files are not picked up
+CACHE_FORMAT_VERSION = 1
+
+
+def fingerprint(arrays, **info):
+    """
+    Computes a hash identifying the data the mutual information values are computed from
+
+    :param arrays: list of numpy arrays (f.ex. the discretized data and the label codes)
+    :param info: additional values (f.ex. the name of the estimator) that influence the cached values
+    :return: hex string
+    """
+    return utils.fingerprint(arrays, cache_format_version=CACHE_FORMAT_VERSION, **info)
+
+
+def open_cache_array(filename, shape, fill_value=-1., dtype="float64"):
+    """
+    Opens an array that is memory-mapped from an .npy file. If the file does not exist yet it is created and filled
+    with fill_value. Creation is atomic, so several processes may open the same file concurrently
+
+    :param filename: path of the .npy file
+    :param shape: shape of the array
+    :param fill_value: initial value of all entries of a new array
+    :param dtype: data type of a new array
+    :return: numpy.memmap
+    """
+    if not os.path.exists(filename):
+        tmp_filename = "%s.%d.tmp" % (filename, os.getpid())
+        array = np.lib.format.open_memmap(tmp_filename, mode="w+", dtype=dtype, shape=shape)
+        array[:] = fill_value
+        array.flush()
+        del array
+        try:
+            os.link(tmp_filename, filename)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_filename)
+    array = np.lib.format.open_memmap(filename, mode="r+")
+    if array.shape != tuple(shape):
+        raise ValueError("cache file %s has shape %s, expected %s" % (filename, array.shape, tuple(shape)))
+    return array
+
+
+def open_cache_bitmap(filename, n_bits):
+    """
+    Opens a memory-mapped uint8 bitmap from an .npy file, creating it (all bits unset) if it does not exist yet
+    """
+    n_bytes = (n_bits + 7) // 8
+    return open_cache_array(filename, (n_bytes,), fill_value=0, dtype="uint8")
+
+
+class SymmetricMICache(object):
+    """
+    Base class of the caches for symmetric pairwise values such as the redundancy I(X_i;X_j) and the class
+    conditional redundancy I(X_i;X_j|Y). Values are accessed elementwise for (broadcast) arrays of feature ids i and
+    j; values that have not been computed yet are reported as -1.
+    """
+    def __init__(self, n_features):
+        self._n_features = n_features
+
+    def get(self, i, j):
+        """
+        :param i: feature id(s)
+        :param j: feature id(s), broadcast against i
+        :return: cached value(s) of the pairs (i, j), -1 where no value is cached
+        """
+        raise NotImplementedError
+
+    def set(self, i, j, values):
+        """
+        Stores the value(s) of the pairs (i, j) (and thereby of (j, i))
+        """
+        raise NotImplementedError
+
+    def n_cached(self):
+        """
+        :return: number of unordered pairs (including i == j) whose value is cached
+        """
+        raise NotImplementedError
+
+    def is_complete(self):
+        return self.n_cached() == self._n_features * (self._n_features + 1) // 2
+
+    def to_array(self):
+        """
+        :return: dense (n_features, n_features) float64 array of all values, -1 where no value is cached
+        """
+        features = np.arange(self._n_features)
+        return self.get(features[:, None], features[None, :])
+
+
+class DenseMICache(SymmetricMICache):
+    """
+    Stores all values in a dense (n_features, n_features) float64 matrix, optionally memory-mapped from an .npy file.
+    Fastest access, but needs 8 * n_features ** 2 bytes. The matrix may also be provided by the caller (f.ex. in shared
+    memory, see mutual_information.SharedArray).
+    """
+    def __init__(self, n_features, filename=None, values=None):
+        super(DenseMICache, self).__init__(n_features)
+        if values is not None:
+            self._values = values
+        elif filename is None:
+            self._values = np.zeros((n_features, n_features)) - 1.
+        else:
+            self._values = open_cache_array(filename, (n_features, n_features))
+
+    def get(self, i, j):
+        return self._values[i, j]
+
+    def set(self, i, j, values):
+        self._values[i, j] = values
+        self._values[j, i] = values
+
+    def n_cached(self):
+        return int(np.sum(np.triu(self._values != -1)))
+
+    def to_array(self):
+        return np.array(self._values)
+
+
+class PackedMICache(SymmetricMICache):
+    """
+    Stores only the upper triangle (including the diagonal) as a packed float32 vector together with a bitmap that
+    flags the computed entries. Needs about 2 * n_features ** 2 bytes, a quarter of DenseMICache. Values are rounded
+    to single precision. Optionally memory-mapped from two .npy files.
+    """
+    def __init__(self, n_features, filename=None):
+        super(PackedMICache, self).__init__(n_features)
+        n_values = n_features * (n_features + 1) // 2
+        if filename is None:
+            self._values = np.zeros(n_values, dtype="float32")
+            self._valid = np.zeros((n_values + 7) // 8, dtype="uint8")
+        else:
+            self._values = open_cache_array(filename, (n_values,), fill_value=0, dtype="float32")
+            self._valid = open_cache_bitmap(os.path.splitext(filename)[0] + "_valid.npy", n_values)
+
+    def _index(self, i, j):
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        low = np.minimum(i, j)
+        high = np.maximum(i, j)
+        return low * self._n_features - low * (low - 1) // 2 + (high - low)
+
+    def get(self, i, j):
+        index = self._index(i, j)
+        valid = (self._valid[index >> 3] >> (index & 7).astype("uint8")) & 1
+        values = np.where(valid == 1, self._values[index].astype("float64"), -1.)
+        return values[()] if values.ndim == 0 else values
+
+    def set(self, i, j, values):
+        index = self._index(i, j)
+        self._values[index] = values
+        index = np.ravel(np.broadcast_to(index, np.broadcast(index, np.asarray(values)).shape))
+        np.bitwise_or.at(self._valid, index >> 3, np.left_shift(1, index & 7).astype("uint8"))
+
+    def n_cached(self):
+        return int(np.sum(np.unpackbits(self._valid)))
+
+
+class SparseMICache(SymmetricMICache):
+    """
+    Stores the computed values in a hash map keyed by the pair. Memory only grows with the number of computed pairs,
+    which makes it the choice for very wide data of which only a small fraction of all pairs is ever needed.
+    """
+    def __init__(self, n_features):
+        super(SparseMICache, self).__init__(n_features)
+        self._values = {}
+
+    def _keys(self, i, j):
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        return np.minimum(i, j) * self._n_features + np.maximum(i, j)
+
+    def get(self, i, j):
+        keys = self._keys(i, j)
+        values = np.array([self._values.get(key, -1.) for key in keys.ravel().tolist()]).reshape(keys.shape)
+        return values[()] if values.ndim == 0 else values
+
+    def set(self, i, j, values):
+        keys, values = np.broadcast_arrays(self._keys(i, j), np.asarray(values, dtype="float64"))
+        self._values.update(zip(keys.ravel().tolist(), values.ravel().tolist()))
+
+    def n_cached(self):
+        return len(self._values)
+
+
+CACHE_BACKENDS = {
+    "dense": DenseMICache,
+    "packed": PackedMICache,
+    "sparse": SparseMICache
+}
+
+
+def create_mi_cache(backend, n_features, filename=None):
+    """
+    :param backend: one of "dense", "packed" or "sparse" (see DenseMICache, PackedMICache and SparseMICache)
+    :param n_features: number of features
+    :param filename: .npy file the cache is memory-mapped from. Default (None) keeps the cache in memory
+    :return: SymmetricMICache instance
+    """
+    if backend not in CACHE_BACKENDS:
+        raise ValueError("cache backend must be one of the following: %s" % str(list(CACHE_BACKENDS.keys())))
+    if filename is None:
+        return CACHE_BACKENDS[backend](n_features)
+    if backend == "sparse":
+        raise ValueError("the sparse cache backend cannot be stored on disk")
+    return CACHE_BACKENDS[backend](n_features, filename)
+
+
+def open_mi_cache(cache_dir, key, n_features, backend="dense"):
+    """
+    Opens (or creates) the persistent relevancy, redundancy and class conditional redundancy caches for the data
+    identified by key
+
+    :param cache_dir: directory that holds the caches of all data sets
+    :param key: fingerprint of the data (see fingerprint())
+    :param n_features: number of features
+    :param backend: storage of the pairwise caches, "dense" or "packed"
+    :return: tuple of the memory-mapped relevancy array (n_features, missing values are -1) and the redundancy and
+             class conditional redundancy caches (SymmetricMICache)
+    """
+    directory = os.path.join(cache_dir, key)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    return (open_cache_array(os.path.join(directory, "relevancy.npy"), (n_features,)),
+            create_mi_cache(backend, n_features, os.path.join(directory, "redundancy_%s.npy" % backend)),
+            create_mi_cache(backend, n_features, os.path.join(directory, "class_cond_red_%s.npy" % backend)))
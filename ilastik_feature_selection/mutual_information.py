@@ -0,0 +1,676 @@
+__author__ = 'fabian'
+
+import numpy as np
+from .utils import effective_n_jobs
+
+# maximum number of array elements (sample codes or histogram bins) a single block of columns may occupy. Blocks of
+# this size keep the intermediate arrays in the order of tens of megabytes
+BLOCK_BUDGET = 2 ** 22
+
+LOG2 = np.log(2.0)
+
+
+def encode_labels(Y):
+    """
+    Maps arbitrary labels to consecutive integer codes
+
+    :param Y: (n_samples) array of labels
+    :return: tuple of the (n_samples) integer codes and the number of distinct labels
+    """
+    states, codes = np.unique(np.asarray(Y), return_inverse=True)
+    return codes.astype(np.intp).ravel(), len(states)
+
+
+def _sum_terms(terms, n_axes):
+    """
+    Sums the last n_axes axes of terms sequentially in ascending order of the values. This makes the result
+    independent of the layout (and zero padding) of the histogram, i.e. I(X;Z) and I(Z;X) are exactly identical
+    """
+    terms = terms.reshape(terms.shape[:terms.ndim - n_axes] + (-1,))
+    return np.cumsum(np.sort(terms, axis=-1), axis=-1)[..., -1]
+
+
+def mutual_information_from_counts(counts):
+    """
+    Computes the mutual information (in bits) of joint histograms
+
+    :param counts: (..., n_states_x, n_states_y) array of joint counts. The last two axes hold the joint histogram,
+                   all leading axes are treated as independent histograms
+    :return: array of shape counts.shape[:-2] containing the mutual information of each histogram
+    """
+    counts = np.asarray(counts, dtype="float64")
+    n = counts.sum(axis=(-2, -1))[..., None, None]
+    marginal_x = counts.sum(axis=-1, keepdims=True)
+    marginal_y = counts.sum(axis=-2, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = counts * np.log(counts * n / (marginal_x * marginal_y))
+    terms[counts == 0] = 0.
+    mi = _sum_terms(terms, 2) / n[..., 0, 0] / LOG2
+    return np.maximum(mi, 0.)
+
+
+def conditional_mutual_information_from_counts(counts):
+    """
+    Computes the conditional mutual information I(X;Z|Y) (in bits) of three-way joint histograms
+
+    :param counts: (..., n_states_x, n_states_z, n_states_y) array of joint counts. The last three axes hold the
+                   joint histogram, all leading axes are treated as independent histograms
+    :return: array of shape counts.shape[:-3] containing the conditional mutual information of each histogram
+    """
+    counts = np.asarray(counts, dtype="float64")
+    n = counts.sum(axis=(-3, -2, -1))
+    marginal_xy = counts.sum(axis=-2, keepdims=True)
+    marginal_zy = counts.sum(axis=-3, keepdims=True)
+    marginal_y = counts.sum(axis=(-3, -2), keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = counts * np.log(counts * marginal_y / (marginal_xy * marginal_zy))
+    terms[counts == 0] = 0.
+    cmi = _sum_terms(terms, 3) / n / LOG2
+    return np.maximum(cmi, 0.)
+
+
+def _block_size(n_samples, cells_per_column):
+    """
+    Number of columns that can be processed together without exceeding the element budget
+    """
+    return int(max(1, BLOCK_BUDGET // max(n_samples, cells_per_column, 1)))
+
+
+def _row_chunks(n_samples, n_columns):
+    """
+    Splits the samples into consecutive chunks so that n_columns columns of a chunk stay within the element budget
+    """
+    step = int(max(1, BLOCK_BUDGET // max(n_columns, 1)))
+    return [(start, min(start + step, n_samples)) for start in range(0, n_samples, step)]
+
+
+def relevancy(X, alphabet_sizes, y, n_classes, features=None, block_size=None, weights=None):
+    """
+    Computes the mutual information I(X_i;Y) between many discretized features and the labels. The features are
+    processed in blocks of columns; each block is encoded into joint (feature, state, label) codes and counted with a
+    single bincount.
+
+    :param X: (n_samples, n_features) integer array of discretized data with values in [0, alphabet_sizes[i])
+    :param alphabet_sizes: (n_features) array containing the number of states of each feature
+    :param y: (n_samples) integer array of label codes with values in [0, n_classes)
+    :param n_classes: number of distinct labels
+    :param features: feature ids to compute the relevancy for. Default (None) uses all features
+    :param block_size: number of features per block. Default (None) derives it from BLOCK_BUDGET
+    :param weights: (n_samples) array of non-negative sample weights the histograms are counted with (f.ex. the
+                    multiplicities of a bootstrap resample). Default (None) counts every sample once
+    :return: array containing I(X_i;Y) (in bits) for each requested feature
+    """
+    if features is None:
+        features = np.arange(X.shape[1])
+    features = np.asarray(features, dtype=np.intp)
+    alphabet_sizes = np.asarray(alphabet_sizes, dtype=np.intp)
+    result = np.zeros(len(features))
+    if len(features) == 0:
+        return result
+
+    n_states = int(alphabet_sizes[features].max())
+    if block_size is None:
+        block_size = _block_size(X.shape[0], n_states * n_classes)
+
+    for start in range(0, len(features), block_size):
+        block = features[start:start + block_size]
+        counts = _relevancy_counts(X, block, int(alphabet_sizes[block].max()), y, n_classes, weights)
+        result[start:start + len(block)] = mutual_information_from_counts(counts)
+    return result
+
+
+def _relevancy_counts(X, block, n_states, y, n_classes, weights=None):
+    """
+    :return: (len(block), n_states, n_classes) array of the joint counts of each feature in block and the labels
+             (weighted counts, if weights are given)
+    """
+    cells = n_states * n_classes
+    offsets = np.arange(len(block)) * cells
+    counts = np.zeros(len(block) * cells, dtype=np.int64 if weights is None else "float64")
+    for row_start, row_stop in _row_chunks(X.shape[0], len(block)):
+        codes = X[row_start:row_stop, block].astype(np.intp) * n_classes + y[row_start:row_stop, None]
+        codes += offsets
+        counts += np.bincount(codes.ravel(), _chunk_weights(weights, row_start, row_stop, codes.shape),
+                              minlength=len(block) * cells)
+    return counts.reshape(len(block), n_states, n_classes)
+
+
+def _chunk_weights(weights, row_start, row_stop, shape):
+    """
+    :return: the weights of the samples row_start:row_stop for each element of a (n_chunk_samples, ...) array of codes
+             (flattened as the codes are by bincount), or None without weights
+    """
+    if weights is None:
+        return None
+    chunk = np.asarray(weights[row_start:row_stop], dtype="float64")
+    return np.broadcast_to(chunk.reshape((-1, ) + (1, ) * (len(shape) - 1)), shape).ravel()
+
+
+def _pairwise(X, alphabet_sizes, rows, columns, y, n_classes, block_size, weights=None):
+    """
+    Joint histograms of each feature in rows with each feature in columns (and the labels y, if given), turned into
+    (conditional) mutual information. The columns are processed in blocks; each row feature is counted against the
+    whole block with a single bincount per chunk of samples. Row features are grouped (by alphabet size) so that the
+    accumulated histograms stay within BLOCK_BUDGET, and the samples are read in chunks, so the working set is bounded regardless
+    of the number of samples.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    columns = np.asarray(columns, dtype=np.intp)
+    alphabet_sizes = np.asarray(alphabet_sizes, dtype=np.intp)
+    result = np.zeros((len(rows), len(columns)))
+    if len(rows) == 0 or len(columns) == 0:
+        return result
+
+    conditional = y is not None
+    if not conditional:
+        n_classes = 1
+    if block_size is None:
+        block_size = _block_size(X.shape[0],
+                                 int(alphabet_sizes[rows].max()) * int(alphabet_sizes[columns].max()) * n_classes)
+
+    for start in range(0, len(columns), block_size):
+        block = columns[start:start + block_size]
+        n_states = int(alphabet_sizes[block].max())
+        block_cells = n_states * n_classes
+        # row features are grouped by their alphabet size so that no histogram is padded with empty bins
+        for n_row_states in np.unique(alphabet_sizes[rows]):
+            row_ids = np.flatnonzero(alphabet_sizes[rows] == n_row_states)
+            group_size = max(1, BLOCK_BUDGET // (len(block) * block_cells * int(n_row_states)))
+            for group_start in range(0, len(row_ids), group_size):
+                group_ids = row_ids[group_start:group_start + group_size]
+                _count_group(X, rows[group_ids], block, int(n_row_states), n_states, y, n_classes, result, group_ids,
+                             start, weights)
+    return result
+
+
+def _count_group(X, group, block, n_row_states, n_states, y, n_classes, result, group_ids, start, weights=None):
+    """
+    Joint histograms of the row features in group (all with n_row_states states) with the features in block, turned
+    into (conditional) mutual information and written to result[group_ids, start:start + len(block)]
+    """
+    counts = _group_counts(X, group, block, n_row_states, n_states, y, n_classes, weights)
+    if y is not None:
+        values = conditional_mutual_information_from_counts(counts)
+    else:
+        values = mutual_information_from_counts(counts)
+    result[group_ids, start:start + len(block)] = values
+
+
+def _group_counts(X, group, block, n_row_states, n_states, y, n_classes, weights=None):
+    """
+    :return: (len(group), len(block), n_row_states, n_states) array of the joint counts of each row feature in group
+             with each feature in block, or (len(group), len(block), n_row_states, n_states, n_classes) array of the
+             joint counts with the labels if y is given (weighted counts, if weights are given)
+    """
+    conditional = y is not None
+    block_cells = n_states * n_classes
+    cells = n_row_states * block_cells
+    offsets = np.arange(len(block)) * cells
+    counts = np.zeros((len(group), len(block) * cells), dtype=np.int64 if weights is None else "float64")
+    for row_start, row_stop in _row_chunks(X.shape[0], len(block) + len(group)):
+        # (x_j, y) codes of the block only need to be computed once for all row features
+        block_data = X[row_start:row_stop, block].astype(np.intp)
+        if conditional:
+            block_data = block_data * n_classes + y[row_start:row_stop, None]
+        block_data += offsets
+        group_data = X[row_start:row_stop, group].astype(np.intp) * block_cells
+        chunk_weights = _chunk_weights(weights, row_start, row_stop, block_data.shape)
+        for r in range(len(group)):
+            codes = group_data[:, r, None] + block_data
+            counts[r] += np.bincount(codes.ravel(), chunk_weights, minlength=len(block) * cells)
+    if conditional:
+        return counts.reshape(len(group), len(block), n_row_states, n_states, n_classes)
+    return counts.reshape(len(group), len(block), n_row_states, n_states)
+
+
+def pairwise_mutual_information(X, alphabet_sizes, rows, columns, block_size=None, weights=None):
+    """
+    Computes the mutual information I(X_i;X_j) between each feature i in rows and each feature j in columns. The
+    columns are processed in blocks; for each row feature one bincount over the joint codes of the whole block is
+    performed.
+
+    :param X: (n_samples, n_features) integer array of discretized data with values in [0, alphabet_sizes[i])
+    :param alphabet_sizes: (n_features) array containing the number of states of each feature
+    :param rows: feature ids of the first variable
+    :param columns: feature ids of the second variable
+    :param block_size: number of column features per block. Default (None) derives it from BLOCK_BUDGET
+    :param weights: (n_samples) array of non-negative sample weights (see relevancy())
+    :return: (len(rows), len(columns)) array containing I(X_i;X_j) in bits
+    """
+    return _pairwise(X, alphabet_sizes, rows, columns, None, None, block_size, weights)
+
+
+def pairwise_conditional_mutual_information(X, alphabet_sizes, y, n_classes, rows, columns, block_size=None,
+                                            weights=None):
+    """
+    Computes the class conditional mutual information I(X_i;X_j|Y) between each feature i in rows and each feature j
+    in columns. Each value is obtained from a single (x_i, x_j, y) joint histogram, so the data is scanned once per
+    block of column features instead of once per class and pair.
+
+    :param X: (n_samples, n_features) integer array of discretized data with values in [0, alphabet_sizes[i])
+    :param alphabet_sizes: (n_features) array containing the number of states of each feature
+    :param y: (n_samples) integer array of label codes with values in [0, n_classes)
+    :param n_classes: number of distinct labels
+    :param rows: feature ids of the first variable
+    :param columns: feature ids of the second variable
+    :param block_size: number of column features per block. Default (None) derives it from BLOCK_BUDGET
+    :param weights: (n_samples) array of non-negative sample weights (see relevancy())
+    :return: (len(rows), len(columns)) array containing I(X_i;X_j|Y) in bits
+    """
+    return _pairwise(X, alphabet_sizes, rows, columns, y, n_classes, block_size, weights)
+
+
+def _encode(X, n_states):
+    if n_states is None:
+        return encode_labels(X)
+    return np.asarray(X).astype(np.intp).ravel(), int(n_states)
+
+
+def mutual_information(X1, X2, n_states=None, weights=None):
+    """
+    Computes I(X1;X2) (in bits) of two discrete variables from their joint histogram
+
+    :param X1: (n_samples) array of discrete values
+    :param X2: (n_samples) array of discrete values
+    :param n_states: tuple of the alphabet sizes of X1 and X2 if both are already encoded as integers in
+                     [0, n_states[k]) (f.ex. discretized features or label codes). The values are then counted directly
+                     with a single dense bincount. Default (None) encodes arbitrary values first
+    :param weights: (n_samples) array of non-negative sample weights. Default (None) counts every sample once
+    :return: mutual information
+    """
+    x1, n_x1 = _encode(X1, None if n_states is None else n_states[0])
+    x2, n_x2 = _encode(X2, None if n_states is None else n_states[1])
+    counts = np.bincount(x1 * n_x2 + x2, weights, minlength=n_x1 * n_x2)
+    return float(mutual_information_from_counts(counts.reshape(n_x1, n_x2)))
+
+
+def conditional_mutual_information(X1, X2, Y, n_states=None, weights=None):
+    """
+    Computes I(X1;X2|Y) (in bits) of three discrete variables from their three-way joint histogram
+
+    :param X1: (n_samples) array of discrete values
+    :param X2: (n_samples) array of discrete values
+    :param Y: (n_samples) array of discrete values
+    :param n_states: tuple of the alphabet sizes of X1, X2 and Y if all three are already encoded as integers in
+                     [0, n_states[k]). Default (None) encodes arbitrary values first
+    :param weights: (n_samples) array of non-negative sample weights. Default (None) counts every sample once
+    :return: conditional mutual information
+    """
+    if n_states is None:
+        n_states = (None, None, None)
+    x1, n_x1 = _encode(X1, n_states[0])
+    x2, n_x2 = _encode(X2, n_states[1])
+    y, n_y = _encode(Y, n_states[2])
+    counts = np.bincount((x1 * n_x2 + x2) * n_y + y, weights, minlength=n_x1 * n_x2 * n_y)
+    return float(conditional_mutual_information_from_counts(counts.reshape(n_x1, n_x2, n_y)))
+
+
+class JointCounts(object):
+    """
+    Keeps the joint histograms that mutual information values were computed from: (x_i, y) for the relevancy and
+    (x_i, x_j, y) for a pair of features, from which both the redundancy I(X_i;X_j) and the class conditional
+    redundancy I(X_i;X_j|Y) follow. When samples are added or removed, only the counts of these samples are added to
+    (or subtracted from) the histograms, and the mutual information is derived from the updated histograms.
+    """
+    def __init__(self, alphabet_sizes, n_classes):
+        """
+        :param alphabet_sizes: (n_features) array containing the number of states of each feature
+        :param n_classes: number of distinct labels
+        """
+        self._alphabet_sizes = np.asarray(alphabet_sizes, dtype=np.intp)
+        self._n_classes = n_classes
+        # feature -> (n_states_i, n_classes) counts
+        self._relevancy = {}
+        # (i, j) with i <= j -> (n_states_i, n_states_j, n_classes) counts
+        self._pairs = {}
+
+    def add_classes(self, n_classes):
+        """
+        Extends all histograms by (empty) bins for new labels
+        """
+        padding = n_classes - self._n_classes
+        for key, counts in self._relevancy.items():
+            self._relevancy[key] = np.pad(counts, [(0, 0), (0, padding)])
+        for key, counts in self._pairs.items():
+            self._pairs[key] = np.pad(counts, [(0, 0), (0, 0), (0, padding)])
+        self._n_classes = n_classes
+
+    def count_relevancy(self, X, y, features):
+        """
+        Counts and stores the (x_i, y) histograms of the given features
+
+        :param X: (n_samples, n_features) integer array of discretized data
+        :param y: (n_samples) integer array of label codes
+        :param features: array of feature ids
+        """
+        features = np.asarray(features, dtype=np.intp)
+        if len(features) == 0:
+            return
+        counts = _relevancy_counts(X, features, int(self._alphabet_sizes[features].max()), y, self._n_classes)
+        for feature, feature_counts in zip(features, counts):
+            self._relevancy[feature] = feature_counts[:self._alphabet_sizes[feature]]
+
+    def count_pairs(self, X, y, feature, others):
+        """
+        Counts and stores the (x_feature, x_j, y) histograms for all j in others
+
+        :param X: (n_samples, n_features) integer array of discretized data
+        :param y: (n_samples) integer array of label codes
+        :param feature: feature id
+        :param others: array of feature ids
+        """
+        others = np.asarray(others, dtype=np.intp)
+        for other, pair_counts in zip(others, self._pair_counts(X, y, feature, others)):
+            if feature <= other:
+                self._pairs[(feature, other)] = pair_counts
+            else:
+                self._pairs[(other, feature)] = pair_counts.transpose(1, 0, 2)
+
+    def _pair_counts(self, X, y, feature, others):
+        n_row_states = int(self._alphabet_sizes[feature])
+        counts = []
+        if len(others) == 0:
+            return counts
+        block_size = _block_size(X.shape[0], n_row_states * int(self._alphabet_sizes[others].max()) * self._n_classes)
+        for start in range(0, len(others), block_size):
+            block = others[start:start + block_size]
+            block_counts = _group_counts(X, [feature], block, n_row_states, int(self._alphabet_sizes[block].max()),
+                                         y, self._n_classes)[0]
+            counts += [c[:, :self._alphabet_sizes[other]] for other, c in zip(block, block_counts)]
+        return counts
+
+    def update(self, X, y, sign=1):
+        """
+        Adds the counts of the samples X (with labels y) to all stored histograms, or subtracts them if sign is -1
+        """
+        features = self.features()
+        if len(features) > 0:
+            counts = _relevancy_counts(X, features, int(self._alphabet_sizes[features].max()), y, self._n_classes)
+            for feature, feature_counts in zip(features, counts):
+                self._relevancy[feature] = self._relevancy[feature] + sign * feature_counts[:self._alphabet_sizes[feature]]
+        for feature, others in self._grouped_pairs():
+            for other, pair_counts in zip(others, self._pair_counts(X, y, feature, others)):
+                self._pairs[(feature, other)] = self._pairs[(feature, other)] + sign * pair_counts
+
+    def _grouped_pairs(self):
+        """
+        :return: list of (i, array of all j with stored (i, j) histograms)
+        """
+        groups = {}
+        for feature, other in self._pairs.keys():
+            groups.setdefault(feature, []).append(other)
+        return [(feature, np.array(sorted(others), dtype=np.intp)) for feature, others in sorted(groups.items())]
+
+    def features(self):
+        """
+        :return: array of the feature ids whose (x_i, y) histograms are stored
+        """
+        return np.array(sorted(self._relevancy.keys()), dtype=np.intp)
+
+    def relevancy(self, features):
+        """
+        :return: array containing I(X_i;Y) for each i in features (whose histograms must be stored)
+        """
+        return np.array([float(mutual_information_from_counts(self._relevancy[feature])) for feature in features])
+
+    def pairs(self):
+        """
+        Iterates over the stored pair histograms, grouped by their first feature
+
+        :return: generator of tuples (i, array of j, I(X_i;X_j) of each j, I(X_i;X_j|Y) of each j)
+        """
+        for feature, others in self._grouped_pairs():
+            yield (feature, others) + self.pairwise(feature, others)
+
+    def pairwise(self, feature, others):
+        """
+        :return: tuple of arrays containing I(X_feature;X_j) and I(X_feature;X_j|Y) for each j in others (whose
+                 histograms must be stored)
+        """
+        redundancy = np.zeros(len(others))
+        class_cond_red = np.zeros(len(others))
+        for index, other in enumerate(others):
+            if feature <= other:
+                counts = self._pairs[(feature, other)]
+            else:
+                counts = self._pairs[(other, feature)].transpose(1, 0, 2)
+            redundancy[index] = mutual_information_from_counts(counts.sum(axis=-1))
+            class_cond_red[index] = conditional_mutual_information_from_counts(counts)
+        return redundancy, class_cond_red
+
+
+class SharedArray(object):
+    def __init__(self, shape, dtype="float64", order="C", fill_value=None):
+        """
+        numpy array in a block of shared memory (multiprocessing.shared_memory) that other processes attach to by
+        name (see attach_shared_array). The block is released as soon as the array itself is garbage collected, so
+        no views (slices) of the array may be kept beyond that
+
+        :param shape: shape of the array
+        :param dtype: data type of the array
+        :param order: memory layout of the array, "C" or "F"
+        :param fill_value: initial value of all entries. Default (None) leaves the entries uninitialised
+        """
+        from multiprocessing import shared_memory
+        import weakref
+        dtype = np.dtype(dtype)
+        memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        self.descriptor = (memory.name, tuple(shape), dtype.str, order)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=memory.buf, order=order)
+        if fill_value is not None:
+            self.array[...] = fill_value
+        weakref.finalize(self.array, _release_shared_memory, memory)
+
+    @classmethod
+    def from_array(cls, array, order="C"):
+        """
+        :return: SharedArray holding a copy of array
+        """
+        shared = cls(np.shape(array), np.asarray(array).dtype, order)
+        shared.array[...] = array
+        return shared
+
+
+def _release_shared_memory(memory):
+    memory.close()
+    memory.unlink()
+
+
+def attach_shared_array(descriptor):
+    """
+    Attaches to the array of a SharedArray (created in another process)
+
+    :param descriptor: SharedArray.descriptor
+    :return: tuple of the multiprocessing.shared_memory.SharedMemory object, which has to be kept alive as long as the
+             array is used, and the numpy array
+    """
+    from multiprocessing import shared_memory
+    name, shape, dtype, order = descriptor
+    try:
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # workaround for CPython bpo-39959: before python 3.13 (which added track=False) every attached block is
+        # registered with the resource tracker of this process, which would unlink the block when this process exits
+        # although it is still owned by the creating process. Registration is therefore suppressed while attaching
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            memory = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    return memory, np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf, order=order)
+
+
+_worker_data = {}
+
+
+def _init_worker(descriptors, alphabet_sizes, n_classes):
+    _worker_data["memory"] = []
+    for key, descriptor in descriptors.items():
+        _worker_data[key] = None
+        if descriptor is not None:
+            memory, _worker_data[key] = attach_shared_array(descriptor)
+            _worker_data["memory"].append(memory)
+    _worker_data["alphabet_sizes"] = alphabet_sizes
+    _worker_data["n_classes"] = n_classes
+
+
+def _relevancy_task(features):
+    values = relevancy(_worker_data["X"], _worker_data["alphabet_sizes"], _worker_data["y"], _worker_data["n_classes"],
+                       features)
+    if _worker_data["relevancy"] is None:
+        return values
+    _worker_data["relevancy"][features] = values
+
+
+def _pairwise_task(conditional, rows, columns):
+    if conditional:
+        values = pairwise_conditional_mutual_information(_worker_data["X"], _worker_data["alphabet_sizes"],
+                                                         _worker_data["y"], _worker_data["n_classes"], rows, columns)
+    else:
+        values = pairwise_mutual_information(_worker_data["X"], _worker_data["alphabet_sizes"], rows, columns)
+    out = _worker_data["class_cond_red" if conditional else "redundancy"]
+    if out is None:
+        return values
+    out[np.ix_(rows, columns)] = values
+    out[np.ix_(columns, rows)] = values.T
+
+
+class SharedMemoryPool(object):
+    def __init__(self, n_jobs, X, alphabet_sizes, y=None, n_classes=None, relevancy=None, redundancy=None,
+                 class_cond_red=None):
+        """
+        Pool of worker processes for the mutual information kernels. The discretized data and the labels are placed
+        in shared memory once, the tasks only transfer feature ids. The results of the workers are written straight
+        into the given shared cache arrays; they are only sent back to the calling process for the kinds of values
+        without a shared cache array.
+
+        :param n_jobs: number of worker processes. -1 uses all cpus
+        :param X: (n_samples, n_features) integer array of discretized data with values in [0, alphabet_sizes[i])
+        :param alphabet_sizes: (n_features) array containing the number of states of each feature
+        :param y: (n_samples) integer array of label codes. Only required for relevancy and conditional tasks
+        :param n_classes: number of distinct labels
+        :param relevancy: SharedArray of shape (n_features) the relevancy values are written to
+        :param redundancy: SharedArray of shape (n_features, n_features) the (symmetric) redundancy values are
+                           written to
+        :param class_cond_red: SharedArray of shape (n_features, n_features) the (symmetric) class conditional
+                               redundancy values are written to
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        self._n_jobs = effective_n_jobs(n_jobs)
+        self._data = [SharedArray.from_array(X, order="F")]
+        descriptors = {"X": self._data[0].descriptor, "y": None}
+        if y is not None:
+            self._data.append(SharedArray.from_array(y))
+            descriptors["y"] = self._data[1].descriptor
+        self._results = {"relevancy": relevancy, "redundancy": redundancy, "class_cond_red": class_cond_red}
+        for key, shared in self._results.items():
+            descriptors[key] = None if shared is None else shared.descriptor
+        self._executor = ProcessPoolExecutor(self._n_jobs, initializer=_init_worker,
+                                             initargs=(descriptors, np.asarray(alphabet_sizes), n_classes))
+
+    def _chunks(self, features):
+        return [chunk for chunk in np.array_split(np.asarray(features, dtype=np.intp), self._n_jobs) if len(chunk) > 0]
+
+    def relevancy(self, features):
+        """
+        Parallel version of relevancy(). The result does not depend on the number of workers
+        """
+        features = np.asarray(features, dtype=np.intp)
+        results = list(self._executor.map(_relevancy_task, self._chunks(features)))
+        if self._results["relevancy"] is not None:
+            return self._results["relevancy"].array[features]
+        return np.concatenate([np.zeros(0)] + results)
+
+    def pairwise(self, rows, columns, conditional=False):
+        """
+        Parallel version of pairwise_mutual_information() (or pairwise_conditional_mutual_information() if conditional
+        is True). The columns are split into one chunk per worker. The result does not depend on the number of
+        workers
+        """
+        chunks = self._chunks(columns)
+        return np.hstack([np.zeros((len(rows), 0))] + list(self.map_pairwise([rows] * len(chunks), chunks,
+                                                                              conditional)))
+
+    def map_pairwise(self, rows, columns, conditional=False):
+        """
+        Computes the (conditional) pairwise mutual information of many tiles, one task per tile
+
+        :param rows: list of arrays of feature ids
+        :param columns: list of arrays of feature ids
+        :param conditional: compute I(X_i;X_j|Y) instead of I(X_i;X_j)
+        :return: generator of the (len(rows[k]), len(columns[k])) arrays of values of all tiles, in order
+        """
+        results = self._executor.map(_pairwise_task, [conditional] * len(rows), rows, columns)
+        out = self._results["class_cond_red" if conditional else "redundancy"]
+        for tile_rows, tile_columns, values in zip(rows, columns, results):
+            if out is not None:
+                values = out.array[np.ix_(tile_rows, tile_columns)]
+            yield values
+
+    def shutdown(self):
+        """
+        Stops the worker processes and releases the shared copy of the data
+        """
+        self._executor.shutdown()
+        self._data = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+def redundancy_tiles(X, alphabet_sizes, n_jobs=1, block_size=None, pool=None):
+    """
+    Computes the pairwise mutual information I(X_i;X_j) of all features. The upper triangle of the symmetric matrix is
+    split into square tiles of block_size features which are computed independently (and optionally in parallel)
+    and yielded one by one, so the full matrix never needs to be held in memory.
+
+    :param X: (n_samples, n_features) integer array of discretized data with values in [0, alphabet_sizes[i])
+    :param alphabet_sizes: (n_features) array containing the number of states of each feature
+    :param n_jobs: number of worker processes. 1 computes everything in the calling process, -1 uses all cpus
+    :param block_size: edge length of the tiles. Default (None) derives it from BLOCK_BUDGET
+    :param pool: SharedMemoryPool for X that is used instead of starting a new one
+    :return: generator of tuples (rows, columns, values) where values is the (len(rows), len(columns)) array
+             containing I(X_i;X_j) in bits
+    """
+    n_features = X.shape[1]
+    alphabet_sizes = np.asarray(alphabet_sizes, dtype=np.intp)
+    n_jobs = effective_n_jobs(n_jobs)
+    if block_size is None:
+        block_size = _block_size(X.shape[0], int(alphabet_sizes.max()) ** 2)
+        if n_jobs > 1:
+            # make sure there are enough tiles to keep all workers busy
+            block_size = min(block_size, -(-n_features // (2 * n_jobs)))
+    blocks = [np.arange(start, min(start + block_size, n_features)) for start in range(0, n_features, block_size)]
+    tiles = [(rows, columns) for i, rows in enumerate(blocks) for columns in blocks[i:]]
+
+    own_pool = pool is None and n_jobs > 1
+    if own_pool:
+        pool = SharedMemoryPool(n_jobs, X, alphabet_sizes)
+    if pool is None:
+        values = (pairwise_mutual_information(X, alphabet_sizes, rows, columns) for rows, columns in tiles)
+    else:
+        values = pool.map_pairwise(*zip(*tiles))
+    try:
+        for (rows, columns), value in zip(tiles, values):
+            yield rows, columns, value
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+
+def redundancy_matrix(X, alphabet_sizes, n_jobs=1, block_size=None, pool=None):
+    """
+    Computes the full symmetric matrix of pairwise mutual information I(X_i;X_j) (see redundancy_tiles)
+
+    :return: (n_features, n_features) array containing I(X_i;X_j) in bits
+    """
+    result = np.zeros((X.shape[1], X.shape[1]))
+    for rows, columns, value in redundancy_tiles(X, alphabet_sizes, n_jobs, block_size, pool):
+        result[np.ix_(rows, columns)] = value
+        result[np.ix_(columns, rows)] = value.T
+    return result
@@ -0,0 +1,37 @@
+__author__ = 'fabian'
+
+import hashlib
+import os
+import numpy as np
+
+
+def fingerprint(arrays, **info):
+    """
+    Computes a hash identifying the contents of some numpy arrays
+
+    :param arrays: list of numpy arrays (f.ex. the discretized data and the label codes)
+    :param info: additional values (f.ex. the name of the estimator) that are included in the hash
+    :return: hex string
+    """
+    sha = hashlib.sha1()
+    for array in arrays:
+        sha.update(("%s %s" % (np.asarray(array).dtype.str, np.shape(array))).encode())
+        # column-major arrays (f.ex. the discretized data) are hashed in their memory order to avoid a copy
+        if np.isfortran(array):
+            array = np.asarray(array).T
+        array = np.ascontiguousarray(array)
+        sha.update(array.data)
+    for key in sorted(info):
+        sha.update(("%s=%r" % (key, info[key])).encode())
+    return sha.hexdigest()
+
+
+def effective_n_jobs(n_jobs):
+    """
+    Resolves the number of workers. Negative values count backwards from the number of cpus (-1 uses all cpus)
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return int(n_jobs)
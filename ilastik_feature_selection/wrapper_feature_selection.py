@@ -2,8 +2,12 @@ __author__ = 'fabian'
 
 # import IPython
 import numpy as np
+from collections import OrderedDict
+import heapq
+import itertools
 from sklearn import model_selection
 import logging
+from .utils import fingerprint, effective_n_jobs
 
 logger = logging.getLogger(__name__)
 # logger = logging.Logger('wrapper_feature_selection')
@@ -73,8 +77,129 @@ class EvaluationFunction(object):
         return score
 
 
+def features_to_bitmask(features):
+    """
+    Converts feature ids to a bitmask: a python int in which bit i is set if feature i is contained. Bitmasks are
+    hashable and can be modified without copying a set (mask | (1 << i) adds, mask & ~(1 << i) removes feature i)
+
+    :param features: iterable of integer feature ids
+    :return: bitmask (python int)
+    """
+    mask = 0
+    for feature in features:
+        mask |= 1 << int(feature)
+    return mask
+
+
+def bitmask_to_features(mask):
+    """
+    :param mask: bitmask (see features_to_bitmask)
+    :return: sorted numpy array of the feature ids whose bits are set
+    """
+    if mask == 0:
+        return np.zeros(0, dtype="int")
+    bytes_of_mask = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(bytes_of_mask, bitorder="little"))
+
+
+def bitmask_size(mask):
+    """
+    :param mask: bitmask (see features_to_bitmask)
+    :return: number of features in the bitmask
+    """
+    return bin(mask).count("1")
+
+
+_worker_data = {}
+
+
+def _init_worker(X, Y, indices, evaluation_function):
+    _worker_data["X"] = X
+    _worker_data["Y"] = Y
+    _worker_data["indices"] = indices
+    _worker_data["evaluation_function"] = evaluation_function
+
+
+def _evaluation_task(feature_set):
+    return _worker_data["evaluation_function"](_worker_data["X"], _worker_data["Y"], _worker_data["indices"],
+                                               feature_set)
+
+
+class EvaluationCache(object):
+    def __init__(self, evaluation_function, max_size=100000):
+        """
+        Memoizes the scores of an evaluation function. The searches of WrapperFeatureSelection evaluate many feature
+        sets repeatedly (f.ex. during floating search or when trying compound operators), and every evaluation is a
+        full cross-validation. Scores are keyed by the feature set (regardless of the order of its features) and a
+        fingerprint of the sample indices. The least recently used score is discarded once max_size scores are stored.
+        The evaluation function is assumed to be deterministic (f.ex. a classifier with a fixed random_state)
+
+        :param evaluation_function: function with the interface evaluation_function(X, Y, indices, feature_set)
+        :param max_size: maximum number of stored scores. 0 disables the cache, None does not bound it
+        """
+        self._evaluation_function = evaluation_function
+        self._max_size = max_size
+        self._scores = OrderedDict()
+        self._n_hits = 0
+        self._n_misses = 0
+
+    def __call__(self, X, Y, indices, feature_set, indices_key=None):
+        return self.evaluate_many(X, Y, indices, [feature_set], indices_key=indices_key)[0]
+
+    def evaluate_many(self, X, Y, indices, feature_sets, evaluate_missing=None, indices_key=None):
+        """
+        Scores several feature sets. Sets that are not cached (each distinct set once) are evaluated in one batch
+
+        :param feature_sets: list of feature sets, each either an iterable of feature ids or a bitmask (see
+                             features_to_bitmask). Bitmasks are passed to the evaluation function as sorted arrays
+        :param evaluate_missing: function that maps a list of feature sets to the list of their scores (f.ex. by
+                                 evaluating them in parallel). Default (None) calls the evaluation function for each
+        :param indices_key: fingerprint of indices (see utils.fingerprint). Callers that score many batches on the
+                            same samples pass it to avoid hashing the indices every time. Default (None) computes it
+        :return: list of scores
+        """
+        if indices_key is None:
+            indices_key = fingerprint([indices])
+        masks = [feature_set if isinstance(feature_set, int) else features_to_bitmask(feature_set)
+                 for feature_set in feature_sets]
+        keys = [(mask, indices_key) for mask in masks]
+        missing = OrderedDict()
+        for key, feature_set in zip(keys, feature_sets):
+            if key in self._scores:
+                self._n_hits += 1
+                self._scores.move_to_end(key)
+            elif key in missing:
+                self._n_hits += 1
+            else:
+                missing[key] = bitmask_to_features(feature_set) if isinstance(feature_set, int) else feature_set
+        if evaluate_missing is None:
+            scores = [self._evaluation_function(X, Y, indices, feature_set) for feature_set in missing.values()]
+        else:
+            scores = evaluate_missing(list(missing.values()))
+        self._n_misses += len(missing)
+        new_scores = dict(zip(missing.keys(), scores))
+        result = [new_scores[key] if key in new_scores else self._scores[key] for key in keys]
+        if self._max_size is None or self._max_size > 0:
+            for key, score in new_scores.items():
+                self._scores[key] = score
+                if self._max_size is not None and len(self._scores) > self._max_size:
+                    self._scores.popitem(last=False)
+        return result
+
+    def get_statistics(self):
+        """
+        :return: dict with the number of cache hits ("hits"), evaluations ("misses") and stored scores ("size")
+        """
+        return {"hits": self._n_hits, "misses": self._n_misses, "size": len(self._scores)}
+
+    def clear(self):
+        self._scores.clear()
+        self._n_hits = 0
+        self._n_misses = 0
+
+
 class WrapperFeatureSelection(object):
-    def __init__(self, X, Y, evaluation_function, method="SFS"):
+    def __init__(self, X, Y, evaluation_function, method="SFS", cache_size=100000, n_jobs=1):
         """
         This class performs wrapper feature selection. It requires an evaluation function for evaluating feature sets
 
@@ -98,14 +223,70 @@ class WrapperFeatureSelection(object):
                                             set is expanded to all yet undiscovered children by adding/removing single
                                             features. All children and their score are saved. In each iteration, the
                                             child with the highest score is selected and expanded.
+        :param cache_size:          number of feature set scores that are remembered (see EvaluationCache), so that
+                                    no feature set is evaluated twice on the same samples (also across runs). 0
+                                    disables the cache, None does not bound it
+        :param n_jobs:              number of worker processes that evaluate the candidate feature sets of each search
+                                    step concurrently. -1 uses all cpus. The evaluation function must be picklable
+                                    (f.ex. a method of EvaluationFunction) unless the processes are forked. The result
+                                    does not depend on this value if the evaluation function is deterministic
         """
         if X.shape[0] != len(Y):
             raise ValueError("X and Y must have have same amount of samples")
         self._X = X
         self._Y = Y
         self._evaluation_function = evaluation_function
+        self._evaluation_cache = EvaluationCache(evaluation_function, cache_size)
+        self._n_jobs = effective_n_jobs(n_jobs)
+        self._executor = None
+        self._indices_key = None
         self.change_method(method)
 
+    def _start_workers(self, indices):
+        """
+        Starts the worker processes (if n_jobs > 1). They receive the data, the sample indices and the evaluation
+        function once, the tasks only transfer feature sets and scores
+        """
+        if self._n_jobs > 1 and self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(self._n_jobs, initializer=_init_worker,
+                                                 initargs=(self._X, self._Y, indices, self._evaluation_function))
+
+    def _stop_workers(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _evaluate_feature_sets(self, indices, feature_sets):
+        """
+        Scores the feature sets (through the cache), using the worker processes if they are running
+
+        :param indices: sample indices (those the workers were started with)
+        :param feature_sets: list of feature sets (bitmasks or iterables of feature ids)
+        :return: list of scores
+        """
+        evaluate_missing = None
+        if self._executor is not None:
+            evaluate_missing = self._evaluate_in_workers
+        return self._evaluation_cache.evaluate_many(self._X, self._Y, indices, feature_sets, evaluate_missing,
+                                                    self._indices_key)
+
+    def _evaluate_feature_set(self, indices, feature_set):
+        """
+        Scores a single feature set (through the cache) in this process
+        """
+        return self._evaluation_cache(self._X, self._Y, indices, feature_set, self._indices_key)
+
+    def _evaluate_in_workers(self, feature_sets):
+        return list(self._executor.map(_evaluation_task, feature_sets))
+
+    def get_cache_statistics(self):
+        """
+        :return: dict with the number of evaluations that were answered from the cache ("hits"), actual evaluations
+                 ("misses") and currently stored scores ("size")
+        """
+        return self._evaluation_cache.get_statistics()
+
     def change_method(self, method):
         """
         :param method:      Determines the search method that is applied:
@@ -129,25 +310,25 @@ class WrapperFeatureSelection(object):
         """ Modifies a feature set by adding (operation = 1) or removing (operation = -1) the feature specified by
         feature_id form the feature_set
 
-        :param feature_set:     set of integer values
+        :param feature_set:     bitmask (see features_to_bitmask)
         :param feature_id:      integer value
         :param operation:       determines the operation that will be performed on the set. 1 for adding, -1 for
                                 removal of the id specified by feature_id
-        :return:                modified feature_set object
+        :return:                modified bitmask
         """
-        assert isinstance(feature_set, set)
+        assert isinstance(feature_set, int)
         assert operation in [-1, 1]
-        feature_set = set(feature_set) # make sure not to override anything
+        bit = 1 << int(feature_id)
         if operation == 1:
-            if feature_id in feature_set:
-                logger.warning("Warning: adding of feature %d: feature is already present in feature set %s"%(feature_id, str(feature_set)))
+            if feature_set & bit:
+                logger.warning("Warning: adding of feature %d: feature is already present in feature set %s"%(feature_id, str(bitmask_to_features(feature_set))))
             else:
-                feature_set.add(feature_id)
+                feature_set |= bit
         else:
-            if not feature_id in feature_set:
-                logger.warning("Warning: removing feature %d: feature is not present in feature set %s"%(feature_id, str(feature_set)))
+            if not feature_set & bit:
+                logger.warning("Warning: removing feature %d: feature is not present in feature set %s"%(feature_id, str(bitmask_to_features(feature_set))))
             else:
-                feature_set.remove(feature_id)
+                feature_set &= ~bit
         return feature_set
 
     def run(self, **kwargs):
@@ -186,15 +367,30 @@ class WrapperFeatureSelection(object):
                                         Default value: 3
             epsilon=0.:                 threshold that determines by how much the evaluation function of a set must improve over the
                                         currently best scoring set in order for the new set to be adopted. Default value 0.0
+            max_open_size=None:         BFS only: beam width. Whenever the open list holds more nodes, the lowest scoring
+                                        ones are discarded. Default value None: unbounded
+            max_closed_size=None:       BFS only: number of expanded nodes that are remembered. Beyond that, the node
+                                        expanded first is forgotten (and may be visited again). Default value None:
+                                        unbounded
         :return: tuple consisting of the best found feature set and the value of its corresponding evaluation function
 
         """
-        if self._method == "SFS":
-            return self.__sequential_feature_selection(direction="forward", **kwargs)
-        elif self._method == "SBE":
-            return self.__sequential_feature_selection(direction="backward", **kwargs)
-        else:
-            return self.__best_first_search(**kwargs)
+        indices = kwargs.get("indices")
+        if indices is None:
+            indices = np.arange(self._X.shape[0])
+        # the indices do not change during a run, so they are hashed for the cache keys only once
+        self._indices_key = fingerprint([indices])
+        self._start_workers(indices)
+        try:
+            if self._method == "SFS":
+                return self.__sequential_feature_selection(direction="forward", **kwargs)
+            elif self._method == "SBE":
+                return self.__sequential_feature_selection(direction="backward", **kwargs)
+            else:
+                return self.__best_first_search(**kwargs)
+        finally:
+            self._stop_workers()
+            self._indices_key = None
 
     def __sequential_feature_selection(self, indices=None, direction="forward", do_advanced_search=False, initial_features=None,
                                      mandatory_features=None, permitted_features=None, overshoot=3, epsilon=0.):
@@ -205,7 +401,7 @@ class WrapperFeatureSelection(object):
         if n_samples != len(self._Y):
             raise AttributeError("Y must have the same length as X has rows (n_samples)")
 
-        if indices == None:
+        if indices is None:
             indices = np.arange(n_samples)
 
         if not ((indices.dtype == np.dtype('int64')) | (indices.dtype == np.dtype('int32'))):
@@ -245,12 +441,17 @@ class WrapperFeatureSelection(object):
         if len(permitted_features.intersection(mandatory_features)) != 0:
             raise AttributeError("feature_search_space cannot contain features from constant_feature_ids")
 
+        # from here on all feature sets are bitmasks
+        mandatory_features = features_to_bitmask(mandatory_features)
+        initial_features = features_to_bitmask(initial_features)
+        remaining_features = features_to_bitmask(remaining_features)
+
         # score initialization, a higher score is better than a lower one
-        if len(initial_features) == 0:
+        if initial_features == 0:
             score_of_current_set = float("-inf")
 
         else:
-            score_of_current_set = self._evaluation_function(self._X, self._Y, indices, initial_features)
+            score_of_current_set = self._evaluate_feature_set(indices, initial_features)
 
         current_features = initial_features
         overall_best_score = score_of_current_set
@@ -262,28 +463,32 @@ class WrapperFeatureSelection(object):
 
         #now start the feature selection process
         while (best_not_changed_in <= overshoot):
-            logger.info("current best feature set %s", str(overall_best))
+            logger.info("current best feature set %s", str(bitmask_to_features(overall_best)))
             score_of_best_feat_to_modify = float("-inf")
             best_feat_to_modify = None
 
             # determine which features to look at in this iteration (all features not in current_features (=remaining
             # features) for SFS; all features in current_features for SBE)
             if direction == "forward":
-                look_at = set(remaining_features)
+                look_at = remaining_features
             else:
-                look_at = set(current_features)
+                look_at = current_features
 
-            for i in look_at:
+            candidates = []
+            new_feature_sets = []
+            for i in bitmask_to_features(look_at).tolist():
                 # modify feature i (set_operation depends on direction=forward/backward) and append constant feature set
                 new_feature_set = self.__apply_operation_to_feature_set(current_features, i, set_operation)
-                new_feature_set = new_feature_set.union(mandatory_features)
+                new_feature_set |= mandatory_features
 
-                if len(new_feature_set) == 0:
+                if new_feature_set == 0:
                     continue
+                candidates += [i]
+                new_feature_sets += [new_feature_set]
 
-                # evaluate this set
-                score_with_new_set = self._evaluation_function(self._X, self._Y, indices, new_feature_set)
-
+            # evaluate all sets of this step at once. The best one is chosen in the same order as they were generated,
+            # so ties are resolved in the same way whether the sets are evaluated in parallel or not
+            for i, score_with_new_set in zip(candidates, self._evaluate_feature_sets(indices, new_feature_sets)):
                 if score_with_new_set > score_of_best_feat_to_modify:
                     best_feat_to_modify = i
                     score_of_best_feat_to_modify = score_with_new_set
@@ -295,7 +500,7 @@ class WrapperFeatureSelection(object):
                 just_modified_feature = best_feat_to_modify
                 score_of_current_set = score_of_best_feat_to_modify
 
-                logger.info("curr set is now: %s", str(current_features))
+                logger.info("curr set is now: %s", str(bitmask_to_features(current_features)))
 
                 # the whole part here is for the floating search [Pudil et al 1994]. It is only accessed if adding/removing
                 # a feature did improve the evaluation function in the previous step
@@ -304,10 +509,10 @@ class WrapperFeatureSelection(object):
                     continue_to_float_search = do_advanced_search
 
                     # if forward selection then curr set must not be empty
-                    if (direction == "forward") & (len(current_features) < 2):
+                    if (direction == "forward") & (bitmask_size(current_features) < 2):
                         continue_to_float_search = False
                     # if backward selection then remaining features cannot be empty
-                    if (direction == "backward") & (len(remaining_features) < 2):
+                    if (direction == "backward") & (bitmask_size(remaining_features) < 2):
                         continue_to_float_search = False
 
                     if continue_to_float_search:
@@ -323,25 +528,29 @@ class WrapperFeatureSelection(object):
                                 look_at = self.__apply_operation_to_feature_set(current_features, just_modified_feature, -1)
                             else:
                                 look_at = self.__apply_operation_to_feature_set(remaining_features, just_modified_feature, -1)
-                            for i in look_at:
+                            candidates = []
+                            new_feature_sets = []
+                            for i in bitmask_to_features(look_at).tolist():
                                 new_feature_set = self.__apply_operation_to_feature_set(current_features, i, floating_search_operation)
-                                new_feature_set = new_feature_set.union(mandatory_features)
-                                if len(new_feature_set) > 0:
-                                    #print new_feature_set
-                                    score_with_new_feature_set = self._evaluation_function(self._X, self._Y, indices, new_feature_set)
-
-                                    if score_with_new_feature_set > best_feat_to_modify_score:
-                                        best_feat_to_modify = i
-                                        best_feat_to_modify_score = score_with_new_feature_set
+                                new_feature_set |= mandatory_features
+                                if new_feature_set != 0:
+                                    candidates += [i]
+                                    new_feature_sets += [new_feature_set]
+
+                            scores = self._evaluate_feature_sets(indices, new_feature_sets)
+                            for i, score_with_new_feature_set in zip(candidates, scores):
+                                if score_with_new_feature_set > best_feat_to_modify_score:
+                                    best_feat_to_modify = i
+                                    best_feat_to_modify_score = score_with_new_feature_set
                             logger.info("best floating search score: %f"%best_feat_to_modify_score)
                             if (best_feat_to_modify_score > score_of_current_set):
                                 remaining_features = self.__apply_operation_to_feature_set(remaining_features, best_feat_to_modify, -floating_search_operation)
                                 current_features = self.__apply_operation_to_feature_set(current_features, best_feat_to_modify, floating_search_operation)
                                 score_of_current_set = best_feat_to_modify_score
-                                logger.info("updated feature set thanks to float search: %s", str(current_features))
-                                if (direction == "forward") & (len(current_features) < 1):
+                                logger.info("updated feature set thanks to float search: %s", str(bitmask_to_features(current_features)))
+                                if (direction == "forward") & (current_features == 0):
                                     continue_float_search = False
-                                if (direction == "backward") & (len(remaining_features) < 1):
+                                if (direction == "backward") & (remaining_features == 0):
                                     continue_float_search = False
                             else:
                                 continue_float_search = False
@@ -349,59 +558,76 @@ class WrapperFeatureSelection(object):
             if score_of_current_set > (overall_best_score - epsilon):
                 overall_best_score = score_of_current_set
                 best_not_changed_in = 0
-                overall_best = current_features.union(mandatory_features)
+                overall_best = current_features | mandatory_features
             else:
                 best_not_changed_in += 1
                 logger.info("best set has not changed in %d iterations" % best_not_changed_in)
 
-        return np.sort(list(overall_best)).astype("int"), overall_best_score
+        return bitmask_to_features(overall_best).astype("int"), overall_best_score
 
     def __best_first_search(self, indices=None, do_advanced_search=False, initial_features=None,
-                          mandatory_features=None, permitted_features=None, overshoot=3, epsilon=0.):
+                          mandatory_features=None, permitted_features=None, overshoot=3, epsilon=0.,
+                          max_open_size=None, max_closed_size=None):
 
         n_samples, n_features = self._X.shape
 
-        def expand_node(node, open_list, closed_list, n_features):
+        def expand_node(node, open_set, closed_set):
             children = []
-            for feature in node:
-                new_child = set(node)
-                new_child.remove(feature)
-                if (not new_child in open_list) and (not new_child in closed_list) and (len(new_child) > 0):
+            for feature in bitmask_to_features(node).tolist():
+                new_child = node & ~(1 << feature)
+                if (not new_child in open_set) and (not new_child in closed_set) and (new_child != 0):
                     children += [new_child]
 
-            features_not_in_node = set(permitted_features).symmetric_difference(node)
-            for feature in features_not_in_node:
-                new_child = set(node)
-                new_child.add(feature)
-                if (not new_child in open_list) and (not new_child in closed_list):
+            features_not_in_node = permitted_features & ~node
+            for feature in bitmask_to_features(features_not_in_node).tolist():
+                new_child = node | (1 << feature)
+                if (not new_child in open_set) and (not new_child in closed_set):
                     children += [new_child]
             return children
 
         def obtain_scores_of_children(children, indices):
-            scores = []
-            for child in children:
-                scores += [self._evaluation_function(self._X, self._Y, indices, np.array(list(child.union(mandatory_features))))]
-            return scores
-
-        def pick_next_node(open_list, open_scores, closed_list):
-            id_of_best_node = np.argmax(open_scores)
-            node = open_list.pop(id_of_best_node)
-            open_scores.pop(id_of_best_node)
-            #IPython.embed()
-            closed_list += [node]
-            return node, open_list, open_scores, closed_list #one could slolve this in a much more elegant way if python
-            # would allow explicit use of pointers
+            return self._evaluate_feature_sets(indices, [child | mandatory_features for child in children])
+
+        def push_node(node, score):
+            # the open list is a max-heap on the score. Ties are resolved by insertion order (running counter), which
+            # picks the same node as an argmax over the scores in insertion order would
+            heapq.heappush(open_heap, (-score, next(insertion_counter), node))
+            open_set.add(node)
+
+        def pick_next_node():
+            _, _, node = heapq.heappop(open_heap)
+            open_set.remove(node)
+            closed_set[node] = None
+            if max_closed_size is not None and len(closed_set) > max_closed_size:
+                # forget the node that was closed first
+                closed_set.popitem(last=False)
+            return node
+
+        def prune_open_list():
+            # evict the lowest scoring nodes (among equal scores the most recently inserted ones). A sorted list is a
+            # valid heap, so the heap invariant is kept
+            if max_open_size is not None and len(open_heap) > max_open_size:
+                open_heap.sort()
+                for _, _, node in open_heap[max_open_size:]:
+                    open_set.remove(node)
+                del open_heap[max_open_size:]
 
         # this whole section is just to check whether all arguments are valid ------------------------------------------
         if n_samples != len(self._Y):
             raise AttributeError("Y must have the same length as X has rows (n_samples)")
 
-        if indices == None:
+        if indices is None:
             indices = np.arange(n_samples)
 
         if not ((indices.dtype == np.dtype('int64')) | (indices.dtype == np.dtype('int32'))):
             raise ValueError("indices must be either None or a numpy array of integer values")
 
+        if (max_open_size is not None) and (max_open_size < 1):
+            raise ValueError("max_open_size must be either None or a positive integer")
+
+        if (max_closed_size is not None) and (max_closed_size < 0):
+            raise ValueError("max_closed_size must be either None or a non-negative integer")
+
         # here we set the default values for constant_feature_ids, feature_search_space and initial_feature_set
         # depending on the selected search direction -------------------------------------------------------------------
         if mandatory_features is None:
@@ -424,42 +650,53 @@ class WrapperFeatureSelection(object):
         if len(permitted_features.intersection(mandatory_features)) != 0:
             raise AttributeError("feature_search_space cannot contain features from constant_feature_ids")
 
+        # from here on all feature sets (nodes) are bitmasks
+        mandatory_features = features_to_bitmask(mandatory_features)
+        permitted_features = features_to_bitmask(permitted_features)
+        initial_features = features_to_bitmask(initial_features)
+
         # score initialization, a higher score is better than a lower one
-        if len(initial_features) == 0:
+        if initial_features == 0:
             score_of_current_set = float("-inf")
 
         else:
-            score_of_current_set = self._evaluation_function(self._X, self._Y, indices, initial_features)
-
-        # initialize open and closed lists
-        open_list = [initial_features]
-        open_scores = [score_of_current_set]
-        closed_list = []
+            score_of_current_set = self._evaluate_feature_set(indices, initial_features)
 
+        # initialize open and closed lists. The open list is a heap of (negative score, insertion number, node),
+        # open_set and closed_set hold the nodes for constant time membership tests. The closed set remembers the order
+        # in which nodes were closed so that the oldest ones can be forgotten
+        open_heap = []
+        open_set = set()
+        closed_set = OrderedDict()
+        insertion_counter = itertools.count()
+        push_node(initial_features, score_of_current_set)
 
         best_set = initial_features
         score_of_best_set = score_of_current_set
 
         best_not_changed_in = 0
         while (best_not_changed_in <= overshoot):
-            logger.info("current best set: %s with score %f"%(str(best_set), score_of_best_set))
+            logger.info("current best set: %s with score %f"%(str(bitmask_to_features(best_set)), score_of_best_set))
             # - retrieve the best node from the open list,
-            # - remove the corresponding entry from the open_list and open_scores,
+            # - remove the corresponding entry from the open list,
             # - add the retrieved node to the closed list
-            next_node, open_list, open_scores, closed_list = pick_next_node(open_list, open_scores, closed_list)
+            if len(open_heap) == 0: # the whole search space has been expanded
+                break
+            next_node = pick_next_node()
 
             # - find all valid expansions of that node (search feature search space for adding features; remove each
             # feature in turn form the node)
             # - valid expansions are those that result in nodes which are not already in the either the open_list
             # or closed_list
-            new_children = expand_node(next_node, open_list, closed_list, n_features)
+            new_children = expand_node(next_node, open_set, closed_set)
 
             # calculate the evaluation function for all children
             new_scores = obtain_scores_of_children(new_children, indices)
 
-            # add all children and their score to the respective lists
-            open_list += new_children
-            open_scores += new_scores
+            # add all children and their score to the open list
+            for child, score in zip(new_children, new_scores):
+                push_node(child, score)
+            prune_open_list()
 
             if len(new_scores) == 0: # if there are only few features (iris dataset) then there may be no valid
             # expansions to a node. In that case jump to the next best node
@@ -476,7 +713,7 @@ class WrapperFeatureSelection(object):
                 score_of_best_set = new_scores.pop(id_of_best_child)
                 best_not_changed_in = 0
                 continue_compound = True
-                logger.info("updated best feature set: %s \t score: %f"%(str(best_set), score_of_best_set))
+                logger.info("updated best feature set: %s \t score: %f"%(str(bitmask_to_features(best_set)), score_of_best_set))
             else:
                 best_not_changed_in += 1
                 logger.info("The feature set has not been updated in the last %d iterations"%best_not_changed_in)
@@ -491,25 +728,25 @@ class WrapperFeatureSelection(object):
                 best_child_score = new_scores.pop(id_of_best_child)
 
                 #find out operation that led to child (f. ex: '+ feature 5' or '- feature 3')
-                modified_feature = best_child.symmetric_difference(next_node)
-                if len(best_child) < len(next_node):
+                modified_feature = (best_child ^ next_node).bit_length() - 1
+                if best_child < next_node:
                     operation = -1
                 else:
                     operation = +1
 
                 # create new child with compound operators
-                compound_child = self.__apply_operation_to_feature_set(best_set, list(modified_feature)[0], operation)
+                compound_child = self.__apply_operation_to_feature_set(best_set, modified_feature, operation)
 
-                if len(compound_child) < 1:
+                if compound_child == 0:
                     break
-                if (compound_child in open_list) or (compound_child in closed_list):
+                if (compound_child in open_set) or (compound_child in closed_set):
                     break
 
                 # if compound_child is valid then evaluate it and add it to the lists
-                score_of_compound_child = self._evaluation_function(self._X, self._Y, indices, compound_child)
+                score_of_compound_child = self._evaluate_feature_set(indices, compound_child)
 
-                open_list += [compound_child]
-                open_scores += [score_of_compound_child]
+                push_node(compound_child, score_of_compound_child)
+                prune_open_list()
 
                 if score_of_compound_child > (score_of_best_set + epsilon):
                     best_set = compound_child
@@ -518,4 +755,4 @@ class WrapperFeatureSelection(object):
                 else:
                     continue_compound = False
 
-        return np.sort(list(best_set.union(mandatory_features))), score_of_best_set
\ No newline at end of file
+        return bitmask_to_features(best_set | mandatory_features), score_of_best_set
\ No newline at end of file
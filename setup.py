@@ -6,6 +6,7 @@ setup(name='ilastik-feature-selection',
       keywords='ilastik feature selection',
       license='MIT',
       packages=['ilastik_feature_selection'],
+      python_requires='>=3.8',
       #install_requires=['scikit-learn'], # Causes problems with conda
       test_suite='nose.collector',
       tests_require=['nose', 'nose-cover3'],
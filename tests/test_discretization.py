@@ -0,0 +1,60 @@
+__author__ = 'fabian'
+import numpy as np
+import pytest
+
+from ilastik_feature_selection.discretization import Discretizer
+
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(0)
+    X = np.column_stack([rng.randn(500) * 10, rng.rand(500), np.zeros(500) + 3., rng.exponential(size=500)])
+    return X
+
+
+def reference_states(X):
+    X = X.copy()
+    for i in range(X.shape[1]):
+        std = X[:, i].std()
+        if std != 0.:
+            X[:, i] /= std
+            X[:, i] -= X[:, i].min()
+    X = np.floor(X).astype("int")
+    return X - X.min(axis=0)
+
+
+def test_std_strategy(data):
+    original = data.copy()
+    discretizer = Discretizer()
+    states = discretizer.fit_transform(data)
+    np.testing.assert_array_equal(data, original)
+    np.testing.assert_array_equal(states, reference_states(data))
+    np.testing.assert_array_equal(discretizer.get_alphabet_sizes(), states.max(axis=0) + 1)
+    assert states.dtype == np.uint8
+    assert states.flags.f_contiguous
+
+    chunked = Discretizer(chunk_size=64).fit_transform(data, out_of_core=True)
+    np.testing.assert_array_equal(chunked, states)
+
+
+@pytest.mark.parametrize('strategy', ["std", "uniform", "quantile"])
+def test_max_bins(data, strategy):
+    discretizer = Discretizer(strategy, n_bins=20, max_bins=8)
+    states = discretizer.fit_transform(data)
+    alphabet_sizes = discretizer.get_alphabet_sizes()
+    assert np.all(alphabet_sizes <= 8)
+    assert np.all(states.max(axis=0) < alphabet_sizes)
+    assert alphabet_sizes[2] == 1
+
+
+def test_quantile_strategy(data):
+    states = Discretizer("quantile", n_bins=5).fit_transform(data)
+    counts = np.bincount(states[:, 0])
+    np.testing.assert_array_equal(counts, [100] * 5)
+
+
+def test_wide_alphabet():
+    X = np.arange(1000.)[:, None]
+    discretizer = Discretizer("uniform", n_bins=1000)
+    assert discretizer.fit_transform(X).dtype == np.uint16
+    np.testing.assert_array_equal(discretizer.get_alphabet_sizes(), [1000])
@@ -0,0 +1,66 @@
+__author__ = 'fabian'
+import numpy as np
+import os
+import pytest
+from sklearn.feature_selection import mutual_info_classif, mutual_info_regression
+
+from ilastik_feature_selection import mutual_information
+from ilastik_feature_selection.estimators import HistogramEstimator, KSGEstimator
+from ilastik_feature_selection.filter_feature_selection import FilterFeatureSelection
+
+
+@pytest.fixture(scope='module')
+def digit_data():
+    test_path = os.path.dirname(os.path.realpath(__file__))
+    digits_X = np.load(test_path + "/digits_data.npy")
+    digits_Y = np.load(test_path + "/digits_target.npy")
+    return digits_X, digits_Y
+
+
+@pytest.fixture(scope='module')
+def continuous_data():
+    rng = np.random.RandomState(1)
+    a = rng.randn(400)
+    c = rng.randn(400)
+    X = np.column_stack([a, a + 0.5 * rng.randn(400), c, rng.randn(400)])
+    Y = (a + 0.3 * rng.randn(400) > 0).astype(int) + (c > 1)
+    return X, Y
+
+
+def test_histogram_estimator(digit_data):
+    X, Y = digit_data
+    X = X.astype("float64")
+    selector = FilterFeatureSelection(X, Y)
+    estimator = HistogramEstimator().fit(X, Y)
+    features = np.array([0, 5, 20, 33, 63])
+    np.testing.assert_array_equal(estimator.relevancy(features), selector._compute_relevancies(features))
+    np.testing.assert_array_equal(estimator.redundancy(20, features), selector._compute_redundancy(20, features))
+    pairs = (np.array([5, 33, 5, 63]), np.array([20, 0, 63, 63]))
+    expected = [selector._compute_class_cond_red(i, [j])[0] for i, j in zip(*pairs)]
+    np.testing.assert_array_equal(estimator.conditional_redundancy(*pairs), expected)
+
+
+def test_ksg_estimator(continuous_data):
+    X, Y = continuous_data
+    estimator = KSGEstimator().fit(X, Y)
+    np.testing.assert_allclose(estimator.relevancy(np.arange(4)),
+                               mutual_info_classif(X, Y, random_state=0) / mutual_information.LOG2)
+    expected = [mutual_info_regression(X[:, [0]], X[:, j], random_state=0)[0] / mutual_information.LOG2
+                for j in range(1, 4)]
+    np.testing.assert_allclose(estimator.redundancy(0, [1, 2, 3]), expected)
+    conditional = estimator.conditional_redundancy(np.array([0, 1]), np.array([1, 0]))
+    assert conditional[0] == conditional[1]
+    assert conditional[0] < estimator.redundancy(0, 1)
+
+
+def test_change_MI_estimator(continuous_data):
+    X, Y = continuous_data
+    selector = FilterFeatureSelection(X, Y, method="JMI")
+    histogram_selection = selector.run(3)
+    selector.change_MI_estimator(KSGEstimator())
+    ksg_selection = selector.run(3)
+    np.testing.assert_array_equal(ksg_selection[:2], [0, 2])
+    np.testing.assert_array_equal(FilterFeatureSelection(X, Y, method="JMI", estimator=KSGEstimator()).run(3),
+                                  ksg_selection)
+    selector.change_MI_estimator(None)
+    np.testing.assert_array_equal(selector.run(3), histogram_selection)
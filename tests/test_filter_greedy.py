@@ -0,0 +1,307 @@
+"""
+These tests compare the vectorized greedy search of FilterFeatureSelection.run against a straightforward greedy
+search that evaluates the criterion functions candidate by candidate. Unlike test_filter_selection.py they do not
+require feast.
+"""
+
+__author__ = 'fabian'
+import numpy as np
+import ilastik_feature_selection
+from ilastik_feature_selection import mutual_information
+import os
+import pytest
+
+METHODS = ["CIFE", "ICAP", "CMIM", "JMI", "mRMR", "MIFS"]
+
+
+@pytest.fixture(scope='module')
+def digit_data():
+    test_path = os.path.dirname(os.path.realpath(__file__))
+    digits_X = np.load(test_path + "/digits_data.npy")
+    digits_Y = np.load(test_path + "/digits_target.npy")
+    return digits_X.astype("float64"), digits_Y
+
+
+def reference_selection(selector, n_features_to_select):
+    current_feature_set = []
+    for _ in range(n_features_to_select):
+        scores = [(selector._evaluate_feature(current_feature_set, feature), -feature)
+                  for feature in range(selector._n_features) if feature not in current_feature_set]
+        current_feature_set += [-max(scores)[1]]
+    return current_feature_set
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_run_matches_reference(digit_data, method):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method)
+    expected = reference_selection(selector, 12)
+    assert list(selector.run(12)) == expected
+
+
+def test_criterion_kwargs(digit_data):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
+    selector.change_method("MIFS", beta=0.3)
+    expected = reference_selection(selector, 12)
+    assert list(selector.run(12)) == expected
+
+
+def test_lazy_cmim(digit_data):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "CMIM")
+    eager = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "CMIM")
+    assert list(selector.run(20, lazy=True)) == list(eager.run(20))
+    assert selector._class_cond_red.n_cached() < eager._class_cond_red.n_cached()
+
+
+@pytest.mark.parametrize('method', ["ICAP", "mRMR", "MIFS"])
+def test_pruned_selection(digit_data, method):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method)
+    eager = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method)
+    assert list(selector.run(20, lazy=True)) == list(eager.run(20))
+    assert selector._redundancy.n_cached() < eager._redundancy.n_cached()
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_parallel_run(digit_data, method):
+    X, Y = digit_data
+    serial = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method)
+    parallel = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method, n_jobs=2)
+    assert list(parallel.run(15)) == list(serial.run(15))
+    np.testing.assert_array_equal(parallel._redundancy.to_array(), serial._redundancy.to_array())
+
+
+def test_persistent_cache(digit_data, tmpdir):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(
+        X, Y, "JMI", cache_dir=str(tmpdir))
+    expected = list(selector.run(10))
+    del selector
+
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(
+        X, Y, "JMI", cache_dir=str(tmpdir))
+    assert np.all(selector._relevancy != -1)
+    n_cached = selector._class_cond_red.n_cached()
+    assert n_cached > 0
+    assert list(selector.run(10)) == expected
+    assert selector._class_cond_red.n_cached() == n_cached
+
+    # different labels must not share the cache
+    other = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(
+        X, Y[::-1], "JMI", cache_dir=str(tmpdir))
+    assert np.all(other._relevancy == -1)
+
+
+@pytest.mark.parametrize('backend', ["packed", "sparse"])
+def test_cache_backends(digit_data, backend):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(
+        X, Y, "JMI", cache_backend=backend)
+    expected = reference_selection(selector, 10)
+    assert list(selector.run(10)) == expected
+    selector.precompute_redundancy()
+    assert selector._redundancy.is_complete()
+
+
+def test_out_of_core(digit_data, tmpdir):
+    X, Y = digit_data
+    filename = str(tmpdir.join("data.npy"))
+    np.save(filename, X)
+    X_mapped = np.load(filename, mmap_mode="r")
+
+    in_memory = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X.copy(), Y, "JMI")
+    streamed = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X_mapped, Y, "JMI")
+    chunked = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "JMI", chunk_size=100)
+    np.testing.assert_array_equal(streamed._X, in_memory._X)
+    np.testing.assert_array_equal(chunked._X, in_memory._X)
+    np.testing.assert_array_equal(chunked._alphabet_sizes, in_memory._alphabet_sizes)
+    expected = list(in_memory.run(10))
+    assert list(streamed.run(10)) == expected
+    assert list(chunked.run(10)) == expected
+
+
+def test_approximate_run(digit_data):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "ICAP")
+    selection = selector.run_approximate(3, initial_sample_size=200)
+    sample_size = selector.get_sample_size()
+    assert 200 <= sample_size <= X.shape[0]
+    order = ilastik_feature_selection.filter_feature_selection._stratified_order(selector._Y_codes, 10)
+    samples = np.sort(order[:sample_size])
+    # the subsample is binned like the whole data
+    subsample = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(
+        X[samples], Y[samples], "ICAP", discretizer=selector._discretizer)
+    subsample._X = np.asfortranarray(selector._X[samples])
+    np.testing.assert_array_equal(selection, subsample.run(3))
+    # every prefix of the stratified order keeps the class proportions
+    np.testing.assert_allclose(np.bincount(Y[order[:200]]), np.bincount(Y) * 200. / len(Y), atol=1)
+
+    np.testing.assert_array_equal(selector.run_approximate(3, initial_sample_size=len(Y)), selector.run(3))
+    assert selector.get_sample_size() == len(Y)
+
+
+class RowSlicedArray(object):
+    """
+    Array-like that only supports X.shape and slicing of rows
+    """
+    def __init__(self, X):
+        self._X = X
+        self.shape = X.shape
+
+    def __getitem__(self, rows):
+        if not isinstance(rows, slice):
+            raise TypeError("only slices of rows are supported")
+        return self._X[rows]
+
+
+def test_approximate_run_out_of_core(digit_data):
+    X, Y = digit_data
+    in_memory = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "ICAP")
+    chunked = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(RowSlicedArray(X), Y, "ICAP",
+                                                                                        chunk_size=100)
+    np.testing.assert_array_equal(chunked.run_approximate(3, initial_sample_size=200),
+                                  in_memory.run_approximate(3, initial_sample_size=200))
+    assert chunked.get_sample_size() == in_memory.get_sample_size()
+
+    samples = np.sort(np.random.RandomState(0).choice(len(Y), 300, replace=False))
+    np.testing.assert_array_equal(
+        ilastik_feature_selection.discretization.read_rows(RowSlicedArray(X), samples, chunk_size=64), X[samples])
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('lazy', [False, True])
+def test_resumed_run(digit_data, method, lazy):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method)
+    expected = list(ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method).run(15))
+    assert list(selector.run(5, lazy=lazy)) == expected[:5]
+    assert list(selector.run(15, lazy=lazy)) == expected
+    assert list(selector.run(8, lazy=lazy)) == expected[:8]
+
+    # the paths are kept per criterion and criterion kwargs
+    selector.change_method("MIFS", beta=0.5)
+    mifs = list(selector.run(6))
+    selector.change_method(method)
+    assert list(selector.run(15)) == expected
+    selector.change_method("MIFS", beta=0.5)
+    assert list(selector.run(6)) == mifs
+
+
+def test_run_many(digit_data):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
+    selector.run(4)
+    results = selector.run_many(METHODS, 15, method_kwargs={"MIFS": {"beta": 0.3}})
+    assert sorted(results.keys()) == sorted(METHODS)
+    for method in METHODS:
+        reference = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y)
+        reference.change_method(method, **({"beta": 0.3} if method == "MIFS" else {}))
+        assert list(results[method]) == list(reference.run(15))
+    selector.change_method("JMI")
+    assert list(selector.run(10)) == list(results["JMI"][:10])
+
+
+@pytest.mark.parametrize('keep_counts', [False, True])
+def test_add_and_remove_samples(digit_data, keep_counts):
+    X, Y = digit_data
+    # the last class only appears among the added samples
+    first = np.flatnonzero(Y != 9)[:1200]
+    added = np.setdiff1d(np.arange(len(Y)), first)
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X[first], Y[first], "JMI",
+                                                                                         keep_counts=keep_counts)
+    selector.run(10)
+    selector.add_samples(X[added], Y[added])
+    assert selector._X.shape == X.shape
+    assert selector._n_classes == 10
+    # only the discretized samples are kept, and the stored path is checked by the next run
+    assert selector._X_input is None
+    assert selector._stale_paths == {("JMI", ())}
+
+    features = np.arange(selector._n_features)
+    X_states = selector._X
+    expected = mutual_information.pairwise_mutual_information(X_states, selector._alphabet_sizes, features, features)
+    np.testing.assert_array_equal(selector._compute_redundancy(3, features), expected[3])
+    expected = mutual_information.pairwise_conditional_mutual_information(
+        X_states, selector._alphabet_sizes, selector._Y_codes, selector._n_classes, [3], features)
+    np.testing.assert_array_equal(selector._compute_class_cond_red(3, features), expected[0])
+    assert list(selector.run(12)) == reference_selection(selector, 12)
+    assert len(selector._stale_paths) == 0
+
+    selector.remove_samples(np.arange(len(first), len(Y)))
+    original = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X[first], Y[first], "JMI")
+    assert list(selector.run(12)) == list(original.run(12))
+    np.testing.assert_array_equal(selector._compute_relevancies(), original._compute_relevancies())
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_add_samples_in_batches(digit_data, lazy):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X[:300], Y[:300], "ICAP")
+    selector.run(8, lazy=lazy)
+    for start in range(300, len(Y), 250):
+        selector.add_samples(X[start:start + 250], Y[start:start + 250])
+    # the discretized samples are appended to a buffer that grows geometrically
+    assert selector._X.shape == X.shape and selector._X_buffer.shape[0] < 2 * len(Y)
+    np.testing.assert_array_equal(selector._X, selector._discretizer.transform(X))
+    assert list(selector.run(8, lazy=lazy)) == reference_selection(selector, 8)
+
+    with pytest.raises(ValueError):
+        selector.change_MI_estimator(ilastik_feature_selection.estimators.KSGEstimator())
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_grouped_run(digit_data, lazy):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "ICAP")
+    # with one feature per group, the grouped selection is the plain selection
+    assert list(selector.run_grouped(10, np.arange(64), lazy=lazy)) == list(selector.run(10))
+
+    # the pixel rows of the digits as groups
+    groups = np.arange(64) // 8
+    grouped = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "ICAP")
+    selection = grouped.run_grouped(6, groups, n_groups_to_select=2, lazy=lazy)
+    assert len(selection) == 6 and len(np.unique(groups[selection])) <= 2
+    # the most relevant feature represents the group that is selected first
+    assert selection[0] == np.argmax(grouped._compute_relevancies())
+    within = np.flatnonzero(np.isin(groups, groups[selection]))
+    assert list(selection) == list(selector._greedy_selection(6, selector._compute_relevancies(), candidates=within))
+    assert grouped._redundancy.n_cached() < selector._redundancy.n_cached()
+    with pytest.raises(ValueError):
+        grouped.run_grouped(20, groups, n_groups_to_select=2)
+    with pytest.raises(ValueError):
+        grouped.run_grouped(6, groups, n_groups_to_select=9, lazy=lazy)
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_selection_runs_out_of_candidates(digit_data, method):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, method)
+    relevancy = selector._compute_relevancies()
+    candidates = np.array([4, 20, 36])
+    # every search stops once all candidates are selected
+    selections = [selector._greedy_selection(5, relevancy, candidates=candidates),
+                  selector._select(5, relevancy, [], True, candidates)]
+    for selection in selections:
+        assert sorted(selection) == list(candidates)
+
+
+def test_stability_selection(digit_data):
+    X, Y = digit_data
+    selector = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "JMI")
+    frequencies = selector.run_stability(5, n_resamples=4, random_state=3)
+    assert frequencies.shape == (64, ) and np.isclose(frequencies.sum(), 5)
+    parallel = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(X, Y, "JMI", n_jobs=2)
+    np.testing.assert_array_equal(parallel.run_stability(5, n_resamples=4, random_state=3), frequencies)
+
+    # the weighted histograms give the same selections as copies of the resampled data
+    counts = np.zeros(64)
+    for seed in np.random.RandomState(3).randint(np.iinfo(np.int32).max, size=4):
+        samples = np.random.RandomState(seed).randint(0, len(Y), len(Y))
+        resample = ilastik_feature_selection.filter_feature_selection.FilterFeatureSelection(
+            X, Y, "JMI", discretizer=selector._discretizer)
+        resample._X = np.asfortranarray(selector._X[samples])
+        resample._Y_codes = selector._Y_codes[samples]
+        counts[resample.run(5)] += 1
+    np.testing.assert_array_equal(counts / 4, frequencies)
@@ -0,0 +1,41 @@
+__author__ = 'fabian'
+import numpy as np
+import pytest
+
+from ilastik_feature_selection import mi_cache
+
+
+@pytest.mark.parametrize('backend', ["dense", "packed", "sparse"])
+def test_symmetric_cache(backend):
+    cache = mi_cache.create_mi_cache(backend, 7)
+    assert cache.get(2, 5) == -1
+    assert cache.n_cached() == 0
+
+    cache.set(5, 2, 0.25)
+    assert cache.get(2, 5) == 0.25
+    cache.set(3, np.array([0, 3, 6]), np.array([0.5, 1.5, 2.5]))
+    np.testing.assert_array_equal(cache.get(np.array([0, 3, 6]), 3), [0.5, 1.5, 2.5])
+    np.testing.assert_array_equal(cache.get(4, np.array([0, 1])), [-1, -1])
+    assert cache.n_cached() == 4
+    assert not cache.is_complete()
+
+    values = np.random.RandomState(0).rand(7, 7).astype("float32")
+    values = np.triu(values) + np.triu(values, 1).T
+    features = np.arange(7)
+    cache.set(features[:, None], features[None, :], values)
+    assert cache.is_complete()
+    np.testing.assert_array_equal(cache.to_array(), values)
+
+
+@pytest.mark.parametrize('backend', ["dense", "packed"])
+def test_persistent_cache(backend, tmpdir):
+    filename = str(tmpdir.join("redundancy.npy"))
+    cache = mi_cache.create_mi_cache(backend, 5, filename)
+    cache.set(1, np.array([1, 4]), np.array([0.5, 0.75]))
+    del cache
+    cache = mi_cache.create_mi_cache(backend, 5, filename)
+    np.testing.assert_array_equal(cache.get(np.array([1, 4]), 1), [0.5, 0.75])
+    assert cache.n_cached() == 2
+
+    with pytest.raises(ValueError):
+        mi_cache.create_mi_cache("sparse", 5, filename)
@@ -0,0 +1,138 @@
+__author__ = 'fabian'
+import numpy as np
+import mutual_information_old
+import os
+import pytest
+from sklearn.metrics import mutual_info_score
+
+from ilastik_feature_selection import mutual_information
+from ilastik_feature_selection.filter_feature_selection import FilterFeatureSelection
+
+
+@pytest.fixture(scope='module')
+def digit_data():
+    test_path = os.path.dirname(os.path.realpath(__file__))
+    digits_X = np.load(test_path + "/digits_data.npy")
+    digits_Y = np.load(test_path + "/digits_target.npy")
+    return digits_X, digits_Y
+
+
+@pytest.fixture(scope='module')
+def selector(digit_data):
+    X, Y = digit_data
+    return FilterFeatureSelection(X.astype("float64"), Y)
+
+
+def test_relevancy(selector):
+    X, Y = selector._X, selector._Y
+    expected = [mutual_information_old.calculate_mutual_information_histogram_binning(X[:, i], Y)
+                for i in range(X.shape[1])]
+    # small blocks make sure that blocks with differing alphabet sizes are handled correctly
+    for block_size in [None, 3]:
+        ours = mutual_information.relevancy(selector._X, selector._alphabet_sizes, selector._Y_codes,
+                                            selector._n_classes, block_size=block_size)
+        np.testing.assert_allclose(ours, expected, rtol=1e-4, atol=1e-6)
+
+
+def test_redundancy_matrix(selector):
+    X = selector._X
+    features = [0, 5, 20, 33, 63]
+    expected = np.array([[mutual_information_old.calculate_mutual_information_histogram_binning(X[:, i], X[:, j])
+                          for j in features] for i in features])
+    ours = mutual_information.pairwise_mutual_information(X, selector._alphabet_sizes, features, features,
+                                                          block_size=2)
+    np.testing.assert_allclose(ours, expected, rtol=1e-4, atol=1e-6)
+
+    full = mutual_information.redundancy_matrix(X, selector._alphabet_sizes, block_size=7)
+    np.testing.assert_allclose(full[np.ix_(features, features)], expected, rtol=1e-4, atol=1e-6)
+    np.testing.assert_array_equal(full, full.T)
+    np.testing.assert_allclose(mutual_information.redundancy_matrix(X, selector._alphabet_sizes, n_jobs=2), full)
+
+
+def test_mutual_information(selector):
+    X, Y = selector._X, selector._Y
+    alphabet_sizes = selector._alphabet_sizes
+    expected = mutual_info_score(X[:, 20], X[:, 33]) / np.log(2.0)
+    np.testing.assert_allclose(mutual_information.mutual_information(X[:, 20], X[:, 33]), expected, rtol=1e-10)
+    np.testing.assert_allclose(mutual_information.mutual_information(X[:, 20], X[:, 33], alphabet_sizes[[20, 33]]),
+                               expected, rtol=1e-10)
+    # the single pair kernel gives exactly the same values as the batched kernels
+    assert selector._get_relevancy(20) == mutual_information.relevancy(X, alphabet_sizes, selector._Y_codes,
+                                                                       selector._n_classes, [20])[0]
+    assert selector._get_redundancy(20, 33) == mutual_information.pairwise_mutual_information(
+        X, alphabet_sizes, [33], [20])[0, 0]
+
+
+def test_class_conditional_mutual_information(selector):
+    X, Y = selector._X, selector._Y
+    features = [0, 5, 20, 33, 63]
+    expected = np.array([[mutual_information_old.calculate_conditional_MI(X[:, i], X[:, j], Y)
+                          for j in features] for i in features])
+    ours = mutual_information.pairwise_conditional_mutual_information(
+        X, selector._alphabet_sizes, selector._Y_codes, selector._n_classes, features, features, block_size=2)
+    np.testing.assert_allclose(ours, expected, rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(selector._calculate_class_conditional_MI(X[:, 20], X[:, 33], Y), expected[2, 3],
+                               rtol=1e-4, atol=1e-6)
+
+
+def test_small_working_set(selector, monkeypatch):
+    X = selector._X
+    args = (selector._alphabet_sizes, selector._Y_codes, selector._n_classes)
+    features = np.arange(10)
+    expected = (mutual_information.relevancy(X, *args),
+                mutual_information.pairwise_mutual_information(X, selector._alphabet_sizes, features, features),
+                mutual_information.pairwise_conditional_mutual_information(X, *(args + (features, features))))
+    # force the kernels to work on a few columns and chunks of samples at a time
+    monkeypatch.setattr(mutual_information, "BLOCK_BUDGET", 1000)
+    ours = (mutual_information.relevancy(X, *args),
+            mutual_information.pairwise_mutual_information(X, selector._alphabet_sizes, features, features),
+            mutual_information.pairwise_conditional_mutual_information(X, *(args + (features, features))))
+    for e, o in zip(expected, ours):
+        np.testing.assert_array_equal(e, o)
+
+
+def test_shared_memory_pool(selector):
+    X, y = selector._X, selector._Y_codes
+    alphabet_sizes, n_classes = selector._alphabet_sizes, selector._n_classes
+    rows, columns = np.array([3, 20, 33]), np.arange(10, 40)
+    relevancy = mutual_information.SharedArray((X.shape[1], ), fill_value=-1.)
+    redundancy = mutual_information.SharedArray((X.shape[1], X.shape[1]), fill_value=-1.)
+    with mutual_information.SharedMemoryPool(2, X, alphabet_sizes, y, n_classes, relevancy, redundancy) as pool:
+        np.testing.assert_array_equal(pool.relevancy(columns),
+                                      mutual_information.relevancy(X, alphabet_sizes, y, n_classes, columns))
+        np.testing.assert_array_equal(pool.pairwise(rows, columns),
+                                      mutual_information.pairwise_mutual_information(X, alphabet_sizes, rows, columns))
+        np.testing.assert_array_equal(pool.pairwise(rows, columns, conditional=True),
+                                      mutual_information.pairwise_conditional_mutual_information(
+                                          X, alphabet_sizes, y, n_classes, rows, columns))
+    # the workers have written their results into the shared arrays
+    np.testing.assert_array_equal(relevancy.array[columns],
+                                  mutual_information.relevancy(X, alphabet_sizes, y, n_classes, columns))
+    np.testing.assert_array_equal(redundancy.array[np.ix_(columns, rows)],
+                                  mutual_information.pairwise_mutual_information(X, alphabet_sizes, columns, rows))
+    assert np.all(relevancy.array[:10] == -1)
+
+
+def test_attach_without_track_argument(monkeypatch):
+    # emulates python < 3.13, whose SharedMemory has no track argument (see attach_shared_array)
+    from multiprocessing import resource_tracker, shared_memory
+
+    class SharedMemoryWithoutTrack(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super(SharedMemoryWithoutTrack, self).__init__(name, create, size)
+
+    shared = mutual_information.SharedArray.from_array(np.arange(12.).reshape(3, 4), order="F")
+    registered = []
+
+    def register(name, rtype):
+        registered.append(name)
+
+    monkeypatch.setattr(shared_memory, "SharedMemory", SharedMemoryWithoutTrack)
+    monkeypatch.setattr(resource_tracker, "register", register)
+    memory, array = mutual_information.attach_shared_array(shared.descriptor)
+    np.testing.assert_array_equal(array, shared.array)
+    # attaching did not register the block, and the resource tracker is restored afterwards
+    assert registered == []
+    assert resource_tracker.register is register
+    del array
+    memory.close()
@@ -6,6 +6,10 @@ generated using the same methods as in the tests!
   https://github.com/ilastik/ilastik-feature-selection/issues/1
   Since the proposed workaround is to re-generate the expected results, this
   was done, having sklearn 0.18 as a dependency
+- 2026-10-16: re-generated expected results of the random forest runs (with
+  sklearn 1.9). The wrapper search now passes feature sets to the evaluation
+  function as sorted arrays (instead of in the iteration order of python sets),
+  which changes the column order the classifier is trained on
 """
 
 __author__ = 'fabian'
@@ -27,15 +31,15 @@ def digit_data():
 # Note: added random state in order to conform with the old tests. Maybe we
 # should remove that, have all in the same random state.
 @pytest.mark.parametrize('method, advanced_search, random_state, expected', [
-    ('BFS', False, 14271, (set([5, 20, 21, 27, 30, 34, 36, 38, 43, 44, 47]), 1.20525)),
-    ('BFS', True, 14271, (set([18, 20, 21, 27, 30, 34, 42, 43, 44, 54, 61]), 1.20925)),
-    ('SFS', False, 1275, (set([10, 13, 21, 26, 27, 28, 35, 38, 42, 44, 54]), 1.20525)),
-    ('SFS', True, 1275, (set([10, 13, 21, 26, 27, 28, 35, 38, 42, 44, 54]), 1.20525)),
+    ('BFS', False, 14271, (set([13, 20, 21, 27, 30, 34, 36, 43, 44, 51, 61]), 1.20725)),
+    ('BFS', True, 14271, (set([4, 6, 19, 20, 21, 27, 29, 34, 37, 42, 43, 44, 54, 58]), 1.1885)),
+    ('SFS', False, 1275, (set([5, 20, 21, 27, 29, 33, 37, 42, 43, 44, 61]), 1.21125)),
+    ('SFS', True, 1275, (set([5, 20, 21, 27, 29, 37, 42, 43, 44, 62]), 1.2055)),
     ('SBE', False, 1275, (
         set([
             1, 9, 11, 12, 15, 18, 21, 23, 26, 27, 31, 32, 34, 37, 39, 42, 43,
             44, 45, 46, 48, 49, 54, 58, 60]), 1.12975)),
-    ('SBE', True, 1275, (set([20, 21, 26, 27, 34, 37, 38, 42, 43, 44, 49, 61]), 1.215)),
+    ('SBE', True, 1275, (set([4, 6, 7, 13, 20, 21, 26, 27, 31, 32, 34, 37, 38, 42, 43, 44, 46, 52, 60]), 1.18125)),
 ])
 def test_wrapper(digit_data, method, advanced_search, random_state, expected):
     X, Y = digit_data
@@ -59,15 +63,16 @@ def test_initial_set(digit_data):
         X, Y, eval_fct.evaluate_feature_set_size_penalty, method="SFS")
 
     a = feat_selector.run(do_advanced_search=False, initial_features=set(range(10)))
-    expected_feature_set = set([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 21, 22, 26, 27, 35, 38, 42, 43, 45, 53, 58])
-    expected_eval_func_value = 1.14475
+    expected_feature_set = set([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 21, 27, 30, 40, 42, 43, 61])
+    expected_eval_func_value = 1.15975
     assert set(a[0]) == expected_feature_set
     np.testing.assert_almost_equal(a[1], expected_eval_func_value)
 
     feat_selector.change_method("BFS")
     a = feat_selector.run(do_advanced_search=False, initial_features=set(range(10)))
-    expected_feature_set = set([0, 3, 4, 5, 6, 9, 21, 26, 27, 30, 42, 43, 45, 50, 51, 52, 53])
-    expected_eval_func_value = 1.19975
+    # re-generated 2026-10-16: the classifier sees the columns in sorted order (see module docstring)
+    expected_feature_set = set([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 21, 27, 30, 40, 42, 43, 61])
+    expected_eval_func_value = 1.15975
     assert set(a[0]) == expected_feature_set
     np.testing.assert_almost_equal(a[1], expected_eval_func_value)
 
@@ -104,3 +109,159 @@ def test_mandatory_features(digit_data):
     feat_selector.change_method("BFS")
     a = feat_selector.run(do_advanced_search=False, mandatory_features=mandatory_features)
     assert mandatory_features.issubset(set(a[0]))
+
+
+FEATURE_WEIGHTS = np.random.RandomState(0).rand(64)
+
+
+def weighted_score(X, Y, indices, feature_set):
+    features = sorted(feature_set)
+    return np.sum(FEATURE_WEIGHTS[features]) - 0.05 * len(features) ** 1.5
+
+
+def rounded_score(X, Y, indices, feature_set):
+    # many feature sets have the same score
+    return np.round(weighted_score(X, Y, indices, feature_set), 1)
+
+
+_interaction_random_state = np.random.RandomState(1)
+INTERACTION_WEIGHTS = _interaction_random_state.uniform(-0.5, 0.5, 64)
+INTERACTIONS = np.triu(_interaction_random_state.normal(0, 0.2, (64, 64)), 1)
+
+
+def interaction_score(X, Y, indices, feature_set):
+    # depends only on the contained features (not on their order), so the search path is fully determined
+    features = sorted(int(feature) for feature in feature_set)
+    return (np.sum(INTERACTION_WEIGHTS[features]) + np.sum(INTERACTIONS[np.ix_(features, features)]) -
+            0.05 * len(features) ** 1.5)
+
+
+# locks the search paths: the number of evaluations changes if a search visits different feature sets
+@pytest.mark.parametrize('method, advanced_search, expected', [
+    ('SFS', False, (set([0, 1, 4, 5, 6, 10, 11, 12, 13, 15]), 2.284346, 133)),
+    ('SFS', True, (set([0, 1, 3, 4, 5, 6, 10, 11, 12, 15]), 3.012804, 189)),
+    ('SBE', False, (set([0, 1, 3, 4, 5, 6, 8, 9, 10, 11, 12, 15]), 2.990484, 101)),
+    ('SBE', True, (set([0, 1, 3, 4, 5, 6, 8, 9, 10, 11, 12, 15]), 2.990484, 104)),
+    ('BFS', False, (set([0, 1, 3, 4, 5, 6, 10, 11, 12, 15]), 3.012804, 226)),
+    ('BFS', True, (set([0, 1, 3, 4, 5, 6, 10, 11, 12, 15]), 3.012804, 214)),
+])
+def test_search_path(digit_data, method, advanced_search, expected):
+    X, Y = digit_data
+    feat_selector = ilastik_feature_selection.wrapper_feature_selection.WrapperFeatureSelection(
+        X, Y, interaction_score, method=method)
+    a = feat_selector.run(do_advanced_search=advanced_search, permitted_features=set(range(16)))
+    expected_feature_set, expected_eval_func_value, expected_evaluations = expected
+    assert set(a[0]) == expected_feature_set
+    np.testing.assert_almost_equal(a[1], expected_eval_func_value, decimal=6)
+    assert feat_selector.get_cache_statistics()["misses"] == expected_evaluations
+
+
+def test_evaluation_cache(digit_data):
+    X, Y = digit_data
+    evaluated = []
+
+    def evaluate(X, Y, indices, feature_set):
+        evaluated.append(frozenset(feature_set))
+        return weighted_score(X, Y, indices, feature_set)
+
+    feat_selector = ilastik_feature_selection.wrapper_feature_selection.WrapperFeatureSelection(
+        X, Y, evaluate, method="SFS")
+    a = feat_selector.run(do_advanced_search=True)
+    statistics = feat_selector.get_cache_statistics()
+    assert statistics["misses"] == len(evaluated) == len(set(evaluated))
+    assert statistics["hits"] > 0
+
+    # a second run is answered from the cache
+    assert feat_selector.run(do_advanced_search=True)[1] == a[1]
+    assert feat_selector.get_cache_statistics()["misses"] == statistics["misses"]
+
+    # the scores of the least recently used feature sets are discarded
+    cache = ilastik_feature_selection.wrapper_feature_selection.EvaluationCache(evaluate, max_size=2)
+    indices = np.arange(X.shape[0])
+    for feature_set in [{1}, {2}, {1}, {3}, {2, 1}]:
+        cache(X, Y, indices, feature_set)
+    assert cache.get_statistics() == {"hits": 1, "misses": 4, "size": 2}
+    cache(X, Y, indices[:10], {3})
+    assert cache.get_statistics()["misses"] == 5
+
+
+def test_indices_are_hashed_once_per_run(digit_data, monkeypatch):
+    X, Y = digit_data
+    wrapper = ilastik_feature_selection.wrapper_feature_selection
+    hashed = []
+
+    def fingerprint(arrays, **info):
+        hashed.append(len(arrays[0]))
+        return ilastik_feature_selection.utils.fingerprint(arrays, **info)
+
+    monkeypatch.setattr(wrapper, "fingerprint", fingerprint)
+    for method in ["SFS", "SBE", "BFS"]:
+        del hashed[:]
+        feat_selector = wrapper.WrapperFeatureSelection(X, Y, weighted_score, method=method)
+        feat_selector.run(do_advanced_search=True, indices=np.arange(0, X.shape[0], 2))
+        assert hashed == [len(range(0, X.shape[0], 2))]
+
+
+@pytest.mark.parametrize('method', ["SFS", "SBE", "BFS"])
+@pytest.mark.parametrize('score', [weighted_score, rounded_score])
+def test_parallel_evaluation(digit_data, method, score):
+    X, Y = digit_data
+    for advanced_search in [False, True]:
+        serial = ilastik_feature_selection.wrapper_feature_selection.WrapperFeatureSelection(X, Y, score, method=method)
+        parallel = ilastik_feature_selection.wrapper_feature_selection.WrapperFeatureSelection(
+            X, Y, score, method=method, n_jobs=2)
+        a = serial.run(do_advanced_search=advanced_search)
+        b = parallel.run(do_advanced_search=advanced_search)
+        assert list(a[0]) == list(b[0]) and a[1] == b[1]
+        assert serial.get_cache_statistics() == parallel.get_cache_statistics()
+
+
+def test_best_first_search_expands_each_set_once(digit_data):
+    X, Y = digit_data
+    evaluated = []
+
+    def evaluate(X, Y, indices, feature_set):
+        evaluated.append(frozenset(int(feature) for feature in feature_set))
+        return rounded_score(X, Y, indices, feature_set)
+
+    for advanced_search in [False, True]:
+        del evaluated[:]
+        feat_selector = ilastik_feature_selection.wrapper_feature_selection.WrapperFeatureSelection(
+            X, Y, evaluate, method="BFS", cache_size=0)
+        feat_selector.run(do_advanced_search=advanced_search, overshoot=5)
+        # a node that is already in the open or closed list is never generated (and evaluated) again
+        assert len(evaluated) == len(set(evaluated))
+
+
+def test_memory_bounded_best_first_search(digit_data):
+    X, Y = digit_data
+    feat_selector = ilastik_feature_selection.wrapper_feature_selection.WrapperFeatureSelection(
+        X, Y, rounded_score, method="BFS")
+    for advanced_search in [False, True]:
+        a = feat_selector.run(do_advanced_search=advanced_search)
+        # bounds that are never reached do not change the result
+        b = feat_selector.run(do_advanced_search=advanced_search, max_open_size=10 ** 6, max_closed_size=10 ** 6)
+        assert list(a[0]) == list(b[0]) and a[1] == b[1]
+
+        # a narrow beam still yields a valid result
+        c = feat_selector.run(do_advanced_search=advanced_search, max_open_size=5, max_closed_size=20)
+        assert len(c[0]) > 0 and c[1] == rounded_score(X, Y, None, c[0])
+
+    with pytest.raises(ValueError):
+        feat_selector.run(max_open_size=0)
+
+
+def test_bitmask():
+    wrapper = ilastik_feature_selection.wrapper_feature_selection
+    for features in [[], [0], [3, 1, 64, 7], list(range(0, 200, 3))]:
+        mask = wrapper.features_to_bitmask(np.array(features))
+        assert isinstance(mask, int)
+        np.testing.assert_array_equal(wrapper.bitmask_to_features(mask), sorted(features))
+        assert wrapper.bitmask_size(mask) == len(features)
+    # cache keys do not depend on the representation of the feature set
+    cache = wrapper.EvaluationCache(weighted_score)
+    indices = np.arange(10)
+    cache(None, None, indices, {1, 5})
+    cache(None, None, indices, np.array([5, 1]))
+    cache(None, None, indices, wrapper.features_to_bitmask([1, 5]))
+    assert cache.get_statistics() == {"hits": 2, "misses": 1, "size": 1}